@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from catalog.models import Category, Product, Contact, BlogPost, Client, MailingSettings, EmailLog, MailingMessage
+from catalog.models import Category, Product, Contact, BlogPost, Client, MailingSettings, EmailLog, MailingMessage, \
+    ForbiddenWord
+from catalog.search import search_products
 
 
 @admin.register(Category)
@@ -14,6 +16,12 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ('category',)
     search_fields = ('name', 'description')
 
+    def get_search_results(self, request, queryset, search_term):
+        # полнотекстовый поиск по индексу вместо ILIKE '%...%' по всей таблице
+        if not search_term:
+            return queryset, False
+        return search_products(search_term, queryset), False
+
 
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
@@ -43,4 +51,13 @@ class MailingSettingsAdmin(admin.ModelAdmin):
 
 @admin.register(EmailLog)
 class EmailLogAdmin(admin.ModelAdmin):
-    list_display = ('datetime_attempt', 'status', 'settings')
+    list_display = ('datetime_attempt', 'status', 'settings', 'client', 'server_response')
+    list_filter = ('status',)
+    list_select_related = ('settings', 'client')
+    raw_id_fields = ('settings', 'client')
+
+
+@admin.register(ForbiddenWord)
+class ForbiddenWordAdmin(admin.ModelAdmin):
+    list_display = ('word',)
+    search_fields = ('word',)
@@ -7,3 +7,4 @@ class CatalogConfig(AppConfig):
 
     def ready(self):
         from . import permissions
+        from . import signals
@@ -0,0 +1,243 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.template.loader import get_template
+
+from catalog.models import Category
+
+
+def is_shared_cache(alias=DEFAULT_CACHE_ALIAS):
+    """Общий ли кеш для всех процессов: LocMemCache живет в памяти процесса, DummyCache ничего не хранит."""
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class CategoryCache:
+    """
+    Кеш списка категорий в виде кортежей (id, name).
+
+    Ключ в общем кеше содержит номер поколения, который увеличивается при каждом изменении
+    категорий, поэтому старые данные никогда не читаются повторно, а просто истекают.
+    Перед общим кешем стоит локальный (в памяти процесса) уровень, который сверяет поколение
+    не чаще одного раза в ``l1_ttl`` секунд.
+    """
+    generation_key = 'categories:generation'
+
+    def __init__(self, timeout=None, l1_ttl=None):
+        self.timeout = settings.CATEGORIES_CACHE_TIMEOUT if timeout is None else timeout
+        self.l1_ttl = settings.CATEGORIES_CACHE_L1_TTL if l1_ttl is None else l1_ttl
+        self._local = None  # (generation, categories, checked_at)
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _data_key(self, generation):
+        return f'categories:v{generation}'
+
+    def _new_generation(self):
+        # Поколение от времени, чтобы после вытеснения ключа не вернуться к старым данным
+        return int(time.time() * 1000)
+
+    def _get_generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            # add не перезапишет поколение, если его успел создать другой процесс
+            cache.add(self.generation_key, self._new_generation(), None)
+            generation = cache.get(self.generation_key)
+        return generation
+
+    def get(self):
+        local = self._local
+        if local is not None and time.monotonic() - local[2] < self.l1_ttl:
+            self.stats['l1_hits'] += 1
+            return local[1]
+
+        generation = self._get_generation()
+        if local is not None and local[0] == generation:
+            self.stats['l1_hits'] += 1
+            self._local = (generation, local[1], time.monotonic())
+            return local[1]
+
+        key = self._data_key(generation)
+        categories = cache.get(key)
+        if categories is None:
+            self.stats['misses'] += 1
+            categories = list(Category.objects.order_by('id').values_list('id', 'name'))
+            cache.set(key, categories, self.timeout)
+        else:
+            self.stats['l2_hits'] += 1
+
+        self._local = (generation, categories, time.monotonic())
+        return categories
+
+    def invalidate(self):
+        self.stats['invalidations'] += 1
+        self._local = None
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, self._new_generation(), None)
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+category_cache = CategoryCache()
+
+
+class ProductCardCache:
+    """
+    Кеш отрендеренных карточек товара.
+
+    Ключ карточки строится из (pk, last_change_date, active_version_id, category_id), поэтому
+    при изменении товара, его версии или категории карточка просто получает новый ключ.
+    Карточки страницы читаются и записываются пачкой через get_many/set_many.
+    """
+    template_name = 'catalog/includes/inc_catalog_product.html'
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = settings.PRODUCT_CARD_CACHE if alias is None else alias
+        self.timeout = settings.PRODUCT_CARD_CACHE_TIMEOUT if timeout is None else timeout
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def make_key(self, product):
+        changed = product.last_change_date.isoformat() if product.last_change_date else ''
+        return f'product_card:{product.pk}:{changed}:{product.active_version_id}:{product.category_id}'
+
+    def render_many(self, products):
+        template = get_template(self.template_name)
+        if not self.alias:
+            return [template.render({'product': product}) for product in products]
+
+        backend = caches[self.alias]
+        keys = [self.make_key(product) for product in products]
+        cached = backend.get_many(keys)
+        self.stats['hits'] += len(cached)
+
+        rendered, missing = [], {}
+        for key, product in zip(keys, products):
+            if key not in cached:
+                cached[key] = missing[key] = template.render({'product': product})
+            rendered.append(cached[key])
+
+        if missing:
+            self.stats['misses'] += len(missing)
+            backend.set_many(missing, self.timeout)
+        return rendered
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+product_card_cache = ProductCardCache()
+
+
+class ProductDetailCache:
+    """
+    Кеш общей для всех посетителей части страницы товара (название, цена, описание, категория).
+
+    Меню и кнопки зависят от пользователя и рендерятся как обычно. Фрагмент хранится вместе
+    с last_change_date товара и удаляется сигналами при изменении товара или его версий.
+    Переименование категории обновляет last_change_date ее товаров, и старый фрагмент не совпадет по дате.
+    """
+    template_name = 'catalog/includes/inc_product_details.html'
+
+    def __init__(self, alias=None, timeout=None):
+        self.alias = settings.PRODUCT_CARD_CACHE if alias is None else alias
+        self.timeout = settings.PRODUCT_DETAIL_CACHE_TIMEOUT if timeout is None else timeout
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def make_key(self, pk):
+        return f'product_detail:{pk}'
+
+    def render(self, product):
+        template = get_template(self.template_name)
+        if not self.alias:
+            return template.render({'product': product})
+
+        backend = caches[self.alias]
+        key = self.make_key(product.pk)
+        changed = product.last_change_date.isoformat() if product.last_change_date else ''
+        cached = backend.get(key)
+        if cached is not None and cached[0] == changed:
+            self.stats['hits'] += 1
+            return cached[1]
+
+        self.stats['misses'] += 1
+        html = template.render({'product': product})
+        backend.set(key, (changed, html), self.timeout)
+        return html
+
+    def invalidate(self, pk):
+        self.stats['invalidations'] += 1
+        if self.alias:
+            caches[self.alias].delete(self.make_key(pk))
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+product_detail_cache = ProductDetailCache()
+
+
+class ProductFacetCache:
+    """
+    Кеш счетчиков фасетов списков товаров (catalog.filters.ProductFilter.facet_counts).
+
+    Ключ строится из области списка (все товары или категория), значений фильтров и поколения товаров.
+    Поколение увеличивается сигналами при изменении товаров, версий и категорий и после массовых
+    операций (импорт, fill), поэтому устаревшие счетчики не читаются, а просто истекают.
+    Фасеты служат и валидаторами условного GET, так что с process-local кешем, где поколение
+    в разных процессах расходится, кеширование отключено.
+    """
+    generation_key = 'product_facets:generation'
+
+    def __init__(self, timeout=None):
+        self.timeout = settings.PRODUCT_FACETS_CACHE_TIMEOUT if timeout is None else timeout
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    def _new_generation(self):
+        return int(time.time() * 1000)
+
+    def _get_generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, self._new_generation(), None)
+            generation = cache.get(self.generation_key)
+        return generation
+
+    def make_key(self, scope, values, generation):
+        # порядок выбранных категорий и сортировка на счетчики не влияют
+        params = sorted((name, sorted(value) if isinstance(value, list) else value)
+                        for name, value in values.items() if name != 'sort')
+        digest = hashlib.md5(repr((scope, params)).encode()).hexdigest()
+        return f'product_facets:v{generation}:{digest}'
+
+    def get(self, scope, values, compute):
+        """Счетчики для области ``scope`` и фильтров ``values``, при промахе считает их через ``compute()``."""
+        if not is_shared_cache():
+            return compute()
+
+        key = self.make_key(scope, values, self._get_generation())
+        facets = cache.get(key)
+        if facets is None:
+            self.stats['misses'] += 1
+            facets = compute()
+            cache.set(key, facets, self.timeout)
+        else:
+            self.stats['hits'] += 1
+        return facets
+
+    def invalidate(self):
+        self.stats['invalidations'] += 1
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, self._new_generation(), None)
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+product_facet_cache = ProductFacetCache()
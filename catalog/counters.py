@@ -0,0 +1,114 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from catalog.cache import is_shared_cache
+from catalog.models import BlogPost
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    """
+    Счетчик просмотров записей блога.
+
+    Просмотры накапливаются в кеше (атомарный incr по ключу записи) и переносятся в базу
+    пачкой UPDATE ... SET views_count = views_count + n, когда набирается ``threshold``
+    просмотров или проходит ``interval`` секунд с последнего сброса.
+
+    Если кеш не общий для процессов (LocMemCache, DummyCache), команда flush_view_counts и
+    планировщик не увидят накопленного, поэтому каждый просмотр сразу пишется в базу.
+    """
+    key_prefix = 'blog_views'
+    lock_key = 'blog_views:lock'
+
+    def __init__(self, threshold=None, interval=None):
+        self.threshold = settings.BLOG_VIEWS_FLUSH_THRESHOLD if threshold is None else threshold
+        self.interval = settings.BLOG_VIEWS_FLUSH_INTERVAL if interval is None else interval
+        self._pending = set()
+        self._hits = 0
+        self._flushed_at = time.monotonic()
+
+    def _key(self, pk):
+        return f'{self.key_prefix}:{pk}'
+
+    @property
+    def shared(self):
+        return is_shared_cache()
+
+    def increment(self, pk):
+        """Учитывает просмотр и возвращает число еще не сохраненных в базе просмотров записи."""
+        if not self.shared:
+            BlogPost.objects.filter(pk=pk).update(views_count=F('views_count') + 1)
+            return 1
+
+        key = self._key(pk)
+        try:
+            pending = cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, None):
+                pending = 1
+            else:
+                pending = cache.incr(key)
+
+        self._pending.add(pk)
+        self._hits += 1
+        if self._hits >= self.threshold or time.monotonic() - self._flushed_at >= self.interval:
+            try:
+                self.flush(self._pending)
+            except Exception:
+                # сброс - фоновая работа: просмотры останутся в кеше до следующего сброса, страница должна открыться
+                logger.exception('Не удалось сохранить просмотры записей блога')
+        return pending
+
+    def pending(self, pk):
+        return cache.get(self._key(pk), 0)
+
+    def flush(self, ids=None):
+        """
+        Переносит накопленные просмотры в базу и возвращает количество обновленных записей.
+        Без ``ids`` проверяются все записи блога (используется командой flush_view_counts).
+        """
+        self._hits = 0
+        self._flushed_at = time.monotonic()
+        if not self.shared:
+            return 0
+        ids = list(BlogPost.objects.values_list('pk', flat=True) if ids is None else ids)
+        if not ids:
+            return 0
+
+        # Блокировка не дает двум процессам перенести одни и те же просмотры дважды
+        if not cache.add(self.lock_key, 1, 60):
+            return 0
+        try:
+            counts = cache.get_many([self._key(pk) for pk in ids])
+            by_count = defaultdict(list)
+            for pk in ids:
+                count = counts.get(self._key(pk))
+                if count:
+                    by_count[count].append(pk)
+
+            with transaction.atomic():
+                for count, post_ids in by_count.items():
+                    BlogPost.objects.filter(pk__in=post_ids).update(views_count=F('views_count') + count)
+
+            # Вычитаем только перенесенное: просмотры, пришедшие во время сброса, остаются в кеше
+            for count, post_ids in by_count.items():
+                for pk in post_ids:
+                    try:
+                        cache.decr(self._key(pk), count)
+                    except ValueError:
+                        # ключ вытеснен после чтения: просмотры уже в базе, вычитать не из чего
+                        pass
+            self._pending.difference_update(ids)
+        finally:
+            cache.delete(self.lock_key)
+        return sum(len(post_ids) for post_ids in by_count.values())
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections
+
+from catalog.models import EmailLog
+
+logger = logging.getLogger(__name__)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RateLimiter:
+    """Ограничивает общую скорость отправки (писем в секунду) для всех потоков."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self, count=1):
+        """Ждет своей очереди и резервирует ``count`` писем: следующий вызов подождет, пока они не "уйдут"."""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval * count
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DeliveryResult:
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def add(self, sent=0, failed=0):
+        with self._lock:
+            self.sent += sent
+            self.failed += failed
+
+    def __str__(self):
+        return f'отправлено {self.sent}, ошибок {self.failed}'
+
+
+class MailDelivery:
+    """
+    Рассылка писем каждому получателю отдельно.
+
+    Получатели читаются потоком и делятся на пачки по ``batch_size``. Каждую пачку поток
+    отправляет через одно SMTP-соединение, ошибка по одному адресу не прерывает остальных.
+    ``concurrency`` задает число одновременно открытых соединений, ``rate_limit`` -
+    общий лимит писем в секунду (0 - без ограничения). С асинхронным бэкендом (send_messages_detailed)
+    параллельность задает его пул сессий, а ``concurrency`` не используется.
+    """
+
+    def __init__(self, batch_size=None, concurrency=None, rate_limit=None, backend=None, on_result=None,
+                 on_batch=None):
+        self.batch_size = batch_size or settings.MAILING_BATCH_SIZE
+        self.concurrency = concurrency or settings.MAILING_CONCURRENCY
+        self.rate_limiter = RateLimiter(settings.MAILING_RATE_LIMIT if rate_limit is None else rate_limit)
+        self.backend = backend
+        # on_result((client_id, email), error) вызывается после каждой попытки, error равен None при успехе
+        self.on_result = on_result
+        # on_batch() вызывается после каждой отправленной пачки, например чтобы отметить, что воркер жив
+        self.on_batch = on_batch
+
+    def _report(self, recipient, error):
+        if self.on_result is not None:
+            self.on_result(recipient, error)
+
+    def send_batch(self, recipients, subject, body, from_email, result):
+        connection = get_connection(self.backend)
+        self.send_batch_serial(connection, recipients, subject, body, from_email, result)
+        if self.on_batch is not None:
+            self.on_batch()
+
+    def send_batch_serial(self, connection, recipients, subject, body, from_email, result):
+        for index, recipient in enumerate(recipients):
+            try:
+                # open() ничего не делает, если соединение уже открыто
+                connection.open()
+            except Exception as error:
+                logger.exception('Не удалось открыть SMTP-соединение')
+                for rest in recipients[index:]:
+                    self._report(rest, error)
+                result.add(failed=len(recipients) - index)
+                break
+
+            self.rate_limiter.wait()
+            email = recipient[1]
+            message = EmailMessage(subject, body, from_email, [email], connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                logger.warning('Ошибка отправки письма на %s: %s', email, error)
+                self._report(recipient, error)
+                result.add(failed=1)
+                # после ошибки соединение могло оборваться, переподключимся на следующем письме
+                connection.close()
+            else:
+                self._report(recipient, None)
+                result.add(sent=1)
+        connection.close()
+
+    def send_batch_detailed(self, connection, recipients, subject, body, from_email, result):
+        # пачка уходит разом, поэтому лимит расходуем на все ее письма
+        self.rate_limiter.wait(len(recipients))
+        messages = [EmailMessage(subject, body, from_email, [email]) for _, email in recipients]
+        errors = connection.send_messages_detailed(messages)
+        for recipient, error in zip(recipients, errors):
+            if error is not None:
+                logger.warning('Ошибка отправки письма на %s: %s', recipient[1], error)
+            self._report(recipient, error)
+        failed = sum(error is not None for error in errors)
+        result.add(sent=len(errors) - failed, failed=failed)
+
+    def send(self, recipients, subject, body, from_email=None):
+        """Отправляет письмо получателям - паре (client_id, email), client_id может быть None."""
+        from_email = from_email or settings.EMAIL_HOST_USER
+        connection = get_connection(self.backend)
+        if hasattr(connection, 'send_messages_detailed'):
+            return self.send_detailed(connection, recipients, subject, body, from_email)
+
+        result = DeliveryResult()
+        if self.concurrency == 1:
+            for batch in chunked(recipients, self.batch_size):
+                self.send_batch(batch, subject, body, from_email, result)
+            return result
+
+        # Не больше двух пачек в очереди на поток, чтобы не читать всех получателей в память
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def worker(batch):
+            try:
+                self.send_batch(batch, subject, body, from_email, result)
+            finally:
+                # on_result мог обращаться к базе из этого потока
+                connections.close_all()
+                slots.release()
+
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for batch in chunked(recipients, self.batch_size):
+                slots.acquire()
+                futures.append(executor.submit(worker, batch))
+                futures = self._check_done(futures)
+        # ошибка в потоке (например, записи журнала) прерывает рассылку, как и при отправке в одном потоке,
+        # а не теряется молча вместе с частью счетчика
+        for future in futures:
+            future.result()
+        return result
+
+    @staticmethod
+    def _check_done(futures):
+        """Поднимает ошибку завершившейся пачки и возвращает незавершенные, чтобы не копить future всей рассылки."""
+        pending = []
+        for future in futures:
+            if future.done():
+                future.result()
+            else:
+                pending.append(future)
+        return pending
+
+    def send_detailed(self, connection, recipients, subject, body, from_email):
+        """
+        Отправка через асинхронный бэкенд: он сам держит пул SMTP-сессий, поэтому пачки идут
+        по очереди через одну петлю событий и одни и те же соединения на всю рассылку.
+        Пачка не меньше пула, чтобы все сессии были заняты.
+        """
+        result = DeliveryResult()
+        batch_size = max(self.batch_size, getattr(connection, 'pool_size', 0))
+        with connection:
+            for batch in chunked(recipients, batch_size):
+                self.send_batch_detailed(connection, batch, subject, body, from_email, result)
+                if self.on_batch is not None:
+                    self.on_batch()
+        return result
+
+    def send_mailing(self, mailing_setting, sent_since=None):
+        """
+        Отправляет рассылку ее клиентам. С ``sent_since`` пропускаются клиенты, которым письмо
+        этой рассылки уже успешно ушло после этого момента (повторный запуск задачи после сбоя).
+        """
+        message = mailing_setting.message
+        clients = mailing_setting.client.all()
+        if sent_since is not None:
+            # client_id IS NOT NULL: NULL в подзапросе NOT IN отсек бы всех клиентов
+            delivered = EmailLog.objects.filter(settings=mailing_setting, status='STATUS_OK',
+                                                datetime_attempt__gte=sent_since, client__isnull=False)
+            clients = clients.exclude(pk__in=delivered.values('client_id'))
+        recipients = clients.values_list('pk', 'email').iterator(chunk_size=self.batch_size)
+        return self.send(recipients, message.subject, message.message_content)
+
+
+class EmailLogWriter:
+    """
+    Журнал попыток рассылки: по записи EmailLog на получателя.
+
+    Записи копятся в буфере и сохраняются через bulk_create пачками по ``batch_size``,
+    так что рассылка на 100 тысяч клиентов пишет журнал парой сотен запросов.
+    Экземпляр передается в MailDelivery как on_result, после рассылки нужно вызвать flush().
+    """
+
+    def __init__(self, mailing_setting, batch_size=None):
+        self.settings_id = mailing_setting.pk
+        self.batch_size = batch_size or settings.MAILING_LOG_BATCH_SIZE
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def __call__(self, recipient, error):
+        log = EmailLog(
+            client_id=recipient[0],
+            settings_id=self.settings_id,
+            status='STATUS_FAILED' if error else 'STATUS_OK',
+            server_response=str(error) if error else None,
+        )
+        logs = None
+        with self._lock:
+            self._buffer.append(log)
+            if len(self._buffer) >= self.batch_size:
+                logs, self._buffer = self._buffer, []
+        if logs:
+            self._write(logs)
+
+    def flush(self):
+        with self._lock:
+            logs, self._buffer = self._buffer, []
+        if logs:
+            self._write(logs)
+
+    def _write(self, logs):
+        EmailLog.objects.bulk_create(logs, batch_size=self.batch_size)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail.backends.base import BaseEmailBackend
+
+try:
+    import aiosmtplib
+except ImportError:
+    aiosmtplib = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSMTPEmailBackend(BaseEmailBackend):
+    """
+    Почтовый бэкенд на asyncio (aiosmtplib) для больших рассылок.
+
+    Пачка писем раздается ``pool_size`` одновременным SMTP-сессиям, каждая сессия отправляет
+    подряд до ``messages_per_connection`` писем и затем переподключается.
+    Между open() и close() бэкенд держит одну петлю событий и открытые SMTP-соединения,
+    так что следующие пачки рассылки идут через те же соединения.
+    Подключается через EMAIL_BACKEND = 'catalog.email_backends.AsyncSMTPEmailBackend'.
+    """
+
+    def __init__(self, host=None, port=None, username=None, password=None, use_tls=None, use_ssl=None,
+                 timeout=None, pool_size=None, messages_per_connection=None, fail_silently=False, **kwargs):
+        super().__init__(fail_silently=fail_silently)
+        if aiosmtplib is None:
+            raise ImproperlyConfigured('Для AsyncSMTPEmailBackend нужен пакет aiosmtplib')
+        self.host = host or settings.EMAIL_HOST
+        self.port = port or settings.EMAIL_PORT
+        self.username = settings.EMAIL_HOST_USER if username is None else username
+        self.password = settings.EMAIL_HOST_PASSWORD if password is None else password
+        self.use_tls = settings.EMAIL_USE_TLS if use_tls is None else use_tls
+        self.use_ssl = settings.EMAIL_USE_SSL if use_ssl is None else use_ssl
+        self.timeout = settings.EMAIL_TIMEOUT if timeout is None else timeout
+        self.pool_size = pool_size or settings.EMAIL_ASYNC_POOL_SIZE
+        self.messages_per_connection = messages_per_connection or settings.EMAIL_ASYNC_MESSAGES_PER_CONNECTION
+        self._loop = None
+        # свободные соединения между пачками: (smtp, сколько писем уже отправлено через него)
+        self._idle = []
+
+    def open(self):
+        if self._loop is not None:
+            return False
+        self._loop = asyncio.new_event_loop()
+        return True
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            self._loop.run_until_complete(self._quit_all())
+        finally:
+            self._loop.close()
+            self._loop, self._idle = None, []
+
+    async def _connect(self):
+        smtp = aiosmtplib.SMTP(hostname=self.host, port=self.port, use_tls=self.use_ssl,
+                               start_tls=self.use_tls, timeout=self.timeout)
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        return smtp
+
+    async def _quit(self, smtp):
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    async def _quit_all(self):
+        await asyncio.gather(*(self._quit(smtp) for smtp, _ in self._idle))
+
+    async def _session(self, queue, results):
+        smtp, sent_on_connection = self._idle.pop() if self._idle else (None, 0)
+        while True:
+            try:
+                index, message = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            # соединение из прошлой пачки сервер мог закрыть по таймауту: тогда одна попытка через новое
+            for retry in (True, False):
+                try:
+                    if smtp is None or sent_on_connection >= self.messages_per_connection:
+                        if smtp is not None:
+                            await self._quit(smtp)
+                        smtp = await self._connect()
+                        sent_on_connection = 0
+                    await smtp.send_message(message.message(), sender=message.from_email,
+                                            recipients=message.recipients())
+                    sent_on_connection += 1
+                    results[index] = None
+                    break
+                except Exception as error:
+                    results[index] = error
+                    # после ошибки соединение могло оборваться, следующее письмо пойдет через новое
+                    if smtp is not None:
+                        smtp.close()
+                    smtp = None
+                    if not (retry and isinstance(error, aiosmtplib.SMTPServerDisconnected)):
+                        break
+        if smtp is not None:
+            self._idle.append((smtp, sent_on_connection))
+
+    async def _send_all(self, email_messages):
+        queue = asyncio.Queue()
+        for item in enumerate(email_messages):
+            queue.put_nowait(item)
+        results = [None] * len(email_messages)
+        sessions = min(self.pool_size, len(email_messages))
+        await asyncio.gather(*(self._session(queue, results) for _ in range(sessions)))
+        return results
+
+    def send_messages_detailed(self, email_messages):
+        """Отправляет письма и возвращает список ошибок по каждому письму (None при успехе)."""
+        if not email_messages:
+            return []
+        new_loop = self.open()
+        try:
+            return self._loop.run_until_complete(self._send_all(email_messages))
+        finally:
+            if new_loop:
+                self.close()
+
+    def send_messages(self, email_messages):
+        email_messages = [message for message in email_messages if message.recipients()]
+        errors = self.send_messages_detailed(email_messages)
+        failed = [error for error in errors if error is not None]
+        if failed and not self.fail_silently:
+            raise failed[0]
+        return len(errors) - len(failed)
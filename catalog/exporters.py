@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+import zlib
+
+from django.conf import settings
+
+from catalog.models import Product
+
+FORMATS = ('csv', 'jsonl')
+
+# Заголовок колонки и поле для values_list: категория и активная версия берутся JOIN-ом
+EXPORT_FIELDS = (
+    ('id', 'id'),
+    ('name', 'name'),
+    ('description', 'description'),
+    ('price', 'price'),
+    ('category', 'category__name'),
+    ('creation_date', 'creation_date'),
+    ('last_change_date', 'last_change_date'),
+    ('is_published', 'is_published'),
+    ('version_number', 'active_version__version_number'),
+    ('version_name', 'active_version__version_name'),
+)
+
+
+def export_rows(queryset=None, chunk_size=None):
+    """
+    Строки товаров кортежами. iterator() читает результат порциями по ``chunk_size``
+    (на PostgreSQL через серверный курсор), поэтому память не зависит от размера каталога.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    lookups = [lookup for _, lookup in EXPORT_FIELDS]
+    return queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def iter_csv(rows, rows_per_chunk=500):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _ in EXPORT_FIELDS])
+    for number, row in enumerate(rows, 1):
+        writer.writerow(row)
+        # отдаем кусками по нескольку строк, а не по одной: меньше накладных расходов на запись в сокет
+        if number % rows_per_chunk == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def iter_jsonl(rows, rows_per_chunk=500):
+    headers = [header for header, _ in EXPORT_FIELDS]
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str))
+        if len(lines) >= rows_per_chunk:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def gzip_stream(chunks):
+    """Сжимает поток байтов в формат gzip на лету."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_products(file_format='csv', compress=False, queryset=None, chunk_size=None):
+    """Поток байтов выгрузки товаров в CSV или JSON Lines, при ``compress`` - сжатый gzip."""
+    rows = export_rows(queryset, chunk_size)
+    chunks = iter_csv(rows) if file_format == 'csv' else iter_jsonl(rows)
+    return gzip_stream(chunks) if compress else chunks
@@ -0,0 +1,132 @@
+from django import forms
+from django.db.models import BooleanField, Count, ExpressionWrapper, Max, Min, Q
+
+# Сортировки списка товаров: последним идет id, чтобы порядок был однозначным (нужно и для keyset)
+SORTS = {
+    'new': ('-last_change_date', 'id'),
+    'old': ('last_change_date', 'id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', 'id'),
+}
+
+BOOLEAN_CHOICES = [('', 'Все'), ('1', 'Да'), ('0', 'Нет')]
+
+
+class MultipleIntegerField(forms.TypedMultipleChoiceField):
+    """Список id без проверки по choices, чтобы не загружать все категории ради валидации."""
+
+    def __init__(self, **kwargs):
+        super().__init__(coerce=int, **kwargs)
+
+    def valid_value(self, value):
+        return True
+
+
+class ProductFilterForm(forms.Form):
+    category = MultipleIntegerField(required=False, label='Категория')
+    price_min = forms.DecimalField(min_value=0, required=False, label='Цена от')
+    price_max = forms.DecimalField(min_value=0, required=False, label='Цена до')
+    published = forms.TypedChoiceField(choices=BOOLEAN_CHOICES, coerce=lambda value: value == '1',
+                                       empty_value=None, required=False, label='Опубликован')
+    has_version = forms.TypedChoiceField(choices=BOOLEAN_CHOICES, coerce=lambda value: value == '1',
+                                         empty_value=None, required=False, label='Есть активная версия')
+    sort = forms.ChoiceField(choices=[(key, key) for key in SORTS], required=False, label='Сортировка')
+
+
+class ProductFilter:
+    """
+    Фильтрация и сортировка списка товаров по GET-параметрам:
+    ?category=1&category=2&price_min=10&price_max=100&published=1&has_version=0&sort=price
+
+    Некорректные значения игнорируются, как будто фильтр не задан.
+    """
+    default_sort = 'new'
+
+    def __init__(self, params):
+        self.form = ProductFilterForm(params)
+        self.form.is_valid()
+        # в cleaned_data остаются только поля, прошедшие проверку
+        self.values = self.form.cleaned_data
+
+    @property
+    def ordering(self):
+        return SORTS[self.values.get('sort') or self.default_sort]
+
+    def facet_conditions(self):
+        """Условия фасетов по отдельности, чтобы счетчик фасета можно было считать без его собственного условия."""
+        conditions = {}
+        if self.values.get('category'):
+            conditions['category'] = Q(category_id__in=self.values['category'])
+        if self.values.get('published') is not None:
+            conditions['published'] = Q(is_published=self.values['published'])
+        if self.values.get('has_version') is not None:
+            conditions['has_version'] = Q(active_version__isnull=not self.values['has_version'])
+        return conditions
+
+    def price_condition(self):
+        condition = Q()
+        if self.values.get('price_min') is not None:
+            condition &= Q(price__gte=self.values['price_min'])
+        if self.values.get('price_max') is not None:
+            condition &= Q(price__lte=self.values['price_max'])
+        return condition
+
+    def apply(self, queryset):
+        queryset = queryset.filter(self.price_condition())
+        for condition in self.facet_conditions().values():
+            queryset = queryset.filter(condition)
+        return queryset.order_by(*self.ordering)
+
+    def facet_counts(self, queryset):
+        """
+        Счетчики фасетов одним запросом: GROUP BY (категория, опубликован, есть версия) по товарам
+        в выбранном диапазоне цен. Групп немного (категории x 4), остальное досчитывается в Python.
+        Счетчик каждого фасета учитывает все выбранные фильтры, кроме его собственного.
+        """
+        active = {
+            'category': self.values.get('category') or None,
+            'published': self.values.get('published'),
+            'has_version': self.values.get('has_version'),
+        }
+        groups = (queryset.filter(self.price_condition()).order_by()
+                  .annotate(has_version=ExpressionWrapper(Q(active_version__isnull=False),
+                                                          output_field=BooleanField()))
+                  .values('category_id', 'category__name', 'is_published', 'has_version')
+                  .annotate(count=Count('pk'), price_min=Min('price'), price_max=Max('price'),
+                            last_change_date=Max('last_change_date')))
+
+        categories, published, has_version = {}, {'yes': 0, 'no': 0}, {'yes': 0, 'no': 0}
+        total, price_min, price_max, last_change_date = 0, None, None, None
+        for group in groups:
+            if last_change_date is None or group['last_change_date'] > last_change_date:
+                last_change_date = group['last_change_date']
+            row = {'category': group['category_id'], 'published': group['is_published'],
+                   'has_version': group['has_version']}
+            matches = {
+                'category': active['category'] is None or row['category'] in active['category'],
+                'published': active['published'] is None or row['published'] == active['published'],
+                'has_version': active['has_version'] is None or row['has_version'] == active['has_version'],
+            }
+            count = group['count']
+            if matches['published'] and matches['has_version']:
+                name = group['category__name']
+                categories.setdefault(row['category'], {'name': name, 'count': 0})['count'] += count
+            if matches['category'] and matches['has_version']:
+                published['yes' if row['published'] else 'no'] += count
+            if matches['category'] and matches['published']:
+                has_version['yes' if row['has_version'] else 'no'] += count
+            if all(matches.values()):
+                total += count
+                price_min = group['price_min'] if price_min is None else min(price_min, group['price_min'])
+                price_max = group['price_max'] if price_max is None else max(price_max, group['price_max'])
+
+        return {
+            'total': total,
+            'categories': [{'id': pk, **data} for pk, data in sorted(categories.items(), key=lambda x: x[1]['name'])],
+            'published': published,
+            'has_version': has_version,
+            'price_min': price_min,
+            'price_max': price_max,
+            # самое позднее изменение товаров в диапазоне цен, валидатор для условного GET
+            'last_change_date': last_change_date,
+        }
@@ -2,6 +2,7 @@ from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Submit
 
 from catalog.models import Product, BlogPost, Version, Client, MailingMessage, MailingSettings
+from catalog.moderation import forbidden_words
 from django import forms
 
 
@@ -16,20 +17,14 @@ class CreateProductForm(forms.ModelForm):
 
     def clean_name(self):
         name = self.cleaned_data['name']
-        forbidden_words = ['казино', 'криптовалюта', 'крипта', 'биржа', 'дешево', 'бесплатно', 'обман', 'полиция',
-                           'радар']
-        for word in forbidden_words:
-            if word in name.lower():
-                raise forms.ValidationError("Название содержит запрещенное слово.")
+        if forbidden_words.search(name):
+            raise forms.ValidationError("Название содержит запрещенное слово.")
         return name
 
     def clean_description(self):
         description = self.cleaned_data['description']
-        forbidden_words = ['казино', 'криптовалюта', 'крипта', 'биржа', 'дешево', 'бесплатно', 'обман', 'полиция',
-                           'радар']
-        for word in forbidden_words:
-            if word in description.lower():
-                raise forms.ValidationError("Описание содержит запрещенное слово.")
+        if forbidden_words.search(description):
+            raise forms.ValidationError("Описание содержит запрещенное слово.")
         return description
 
     class Meta:
@@ -81,7 +76,9 @@ class MailingSettingsCreateForm(forms.ModelForm):
 class VersionForm(forms.ModelForm):
     class Meta:
         model = Version
-        fields = ['product', 'version_number', 'version_name', 'is_current']
+        # товар берется из URL; без поля product форма не проверяет уникальность текущей версии
+        # отдельным запросом - предыдущую текущую версию снимает save_version
+        fields = ['version_number', 'version_name', 'is_current']
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -89,16 +86,6 @@ class VersionForm(forms.ModelForm):
         self.helper.form_method = 'post'
         self.helper.add_input(Submit('submit', 'Сохранить'))
 
-    def clean(self):
-        cleaned_data = super().clean()
-        is_current = cleaned_data.get('is_current')
-        product = cleaned_data.get('product')
-
-        if is_current and Version.objects.filter(product=product, is_current=True).count() > 1:
-            raise forms.ValidationError('Может быть только одна текущая версия для данного продукта.')
-
-        return cleaned_data
-
     def clean_is_current(self):
         is_current = self.cleaned_data.get('is_current')
         if is_current is None:
@@ -0,0 +1,221 @@
+import csv
+import io
+import json
+import logging
+import time
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from catalog.cache import product_facet_cache
+from catalog.delivery import chunked
+from catalog.models import Category, Product
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('jsonl', 'csv')
+
+
+class ProductImportError(Exception):
+    pass
+
+
+def detect_format(path):
+    for file_format in FORMATS:
+        if path.endswith(f'.{file_format}'):
+            return file_format
+    raise ProductImportError(f'Не удалось определить формат файла {path}, укажите его явно')
+
+
+def read_rows(file, file_format):
+    """Построчно читает JSON Lines или CSV с заголовком, в памяти всегда одна строка."""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+class ProductImporter:
+    """
+    Потоковая загрузка товаров пачками по ``batch_size`` строк, каждая пачка в своей транзакции.
+
+    Поля строки: name, price, category (название), а также необязательные description, preview,
+    user (почта создателя, по умолчанию ``default_user``), is_published, creation_date.
+    Категории и пользователи один раз загружаются в словари, неизвестные категории создаются
+    при ``create_categories``. С ``use_copy`` пачки загружаются через COPY (только PostgreSQL).
+    """
+    copy_fields = ('name', 'description', 'preview', 'category_id', 'price', 'creation_date',
+                   'last_change_date', 'user_id', 'is_published')
+
+    def __init__(self, batch_size=5000, default_user=None, create_categories=False, use_copy=False):
+        if use_copy and connection.vendor != 'postgresql':
+            raise ProductImportError('COPY поддерживается только для PostgreSQL')
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.use_copy = use_copy
+        self.categories = dict(Category.objects.values_list('name', 'pk'))
+        self.users = dict(get_user_model().objects.values_list('email', 'pk'))
+        self.default_user_id = None
+        if default_user:
+            self.default_user_id = self.users.get(default_user)
+            if self.default_user_id is None:
+                raise ProductImportError(f'Пользователь {default_user} не найден')
+        self.imported = 0
+        self.errors = 0
+
+    def get_category_id(self, name):
+        if name not in self.categories and self.create_categories:
+            self.categories[name] = Category.objects.create(name=name).pk
+        return self.categories.get(name)
+
+    def clean_field(self, name, value):
+        # те же проверки, что у поля модели: значение вне диапазона иначе уронит всю пачку ошибкой базы
+        field = Product._meta.get_field(name)
+        try:
+            value = field.clean(value, None)
+        except ValidationError as error:
+            raise ValueError(f'некорректное поле {name} {value!r}: {" ".join(error.messages)}')
+        # у файловых полей (превью) длину пути clean() не проверяет
+        if field.max_length and value and len(str(value)) > field.max_length:
+            raise ValueError(f'поле {name} длиннее {field.max_length} символов')
+        return value
+
+    def build_product(self, row, now):
+        name = self.clean_field('name', (row.get('name') or '').strip())
+        price = self.clean_field('price', row.get('price'))
+        description = self.clean_field('description', row.get('description') or None)
+        preview = self.clean_field('preview', row.get('preview') or None)
+
+        category_id = self.get_category_id((row.get('category') or '').strip())
+        if category_id is None:
+            raise ValueError(f'неизвестная категория {row.get("category")!r}')
+        user_id = self.users.get(row['user']) if row.get('user') else self.default_user_id
+        if user_id is None:
+            raise ValueError(f'неизвестный пользователь {row.get("user")!r}')
+
+        creation_date = parse_date(row['creation_date']) if row.get('creation_date') else None
+        is_published = str(row.get('is_published', '')).lower() in ('1', 'true', 'yes')
+        # bulk_create не вызывает Product.save(), поэтому даты заполняем сами
+        return Product(
+            name=name,
+            description=description,
+            preview=preview,
+            category_id=category_id,
+            price=price,
+            creation_date=creation_date or now.date(),
+            last_change_date=now,
+            user_id=user_id,
+            is_published=is_published,
+        )
+
+    def copy_products(self, products):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for product in products:
+            writer.writerow([getattr(product, field) for field in self.copy_fields])
+        buffer.seek(0)
+        # пустые значения в CSV COPY читает как NULL
+        sql = f'COPY {Product._meta.db_table} ({", ".join(self.copy_fields)}) FROM STDIN WITH (FORMAT csv)'
+        with connection.cursor() as cursor:
+            cursor.copy_expert(sql, buffer)
+
+    def import_batch(self, rows, first_line):
+        now = timezone.now()
+        products = []
+        for line, row in enumerate(rows, first_line):
+            try:
+                products.append(self.build_product(row, now))
+            except (ValueError, KeyError) as error:
+                self.errors += 1
+                logger.warning('Запись %s пропущена: %s', line, error)
+
+        with transaction.atomic():
+            if self.use_copy:
+                self.copy_products(products)
+            else:
+                Product.objects.bulk_create(products, batch_size=self.batch_size)
+        # bulk_create и COPY не отправляют сигналы
+        product_facet_cache.invalidate()
+        self.imported += len(products)
+
+    def run(self, rows, progress=None):
+        """Загружает строки пачками, после каждой пачки вызывает ``progress(imported, errors, elapsed)``."""
+        started = time.perf_counter()
+        line = 1
+        for batch in chunked(rows, self.batch_size):
+            self.import_batch(batch, line)
+            line += len(batch)
+            if progress is not None:
+                progress(self.imported, self.errors, time.perf_counter() - started)
+        return self.imported, self.errors, time.perf_counter() - started
+
+
+# Естественные ключи справочников, которые fill синхронизирует из фикстуры
+SYNC_NATURAL_KEYS = {
+    'catalog.category': ('name',),
+}
+
+
+def sync_model(model, natural_key, records):
+    """
+    Приводит таблицу ``model`` к записям фикстуры, сопоставляя их по естественному ключу:
+    новые записи создаются, изменившиеся обновляются одним bulk_update, остальные не трогаются.
+    Возвращает счетчики inserted/updated/unchanged, первичные ключи обновленных записей (updated_pks)
+    и имена полей, изменившихся хотя бы у одной из них (updated_fields).
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key and not field.is_relation]
+    field_names = [field.name for field in fields]
+
+    existing = {}
+    for obj in model.objects.order_by('pk').only('pk', *field_names):
+        # при дублях ключа в базе сопоставляем с самой старой записью
+        existing.setdefault(tuple(getattr(obj, name) for name in natural_key), obj)
+
+    to_create, to_update, changed_fields = [], [], set()
+    unchanged = 0
+    for record in records:
+        values = {field.name: field.to_python(record[field.name]) for field in fields if field.name in record}
+        key = tuple(values.get(name) for name in natural_key)
+        obj = existing.get(key)
+        if obj is None:
+            to_create.append(model(**values))
+            continue
+        diff = {name for name, value in values.items() if getattr(obj, name) != value}
+        if not diff:
+            unchanged += 1
+            continue
+        for name in diff:
+            setattr(obj, name, values[name])
+        changed_fields |= diff
+        to_update.append(obj)
+
+    with transaction.atomic():
+        model.objects.bulk_create(to_create)
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(changed_fields))
+    return {'inserted': len(to_create), 'updated': len(to_update), 'unchanged': unchanged,
+            'updated_pks': [obj.pk for obj in to_update], 'updated_fields': sorted(changed_fields)}
+
+
+def sync_fixture(path, natural_keys=None):
+    """Синхронизирует справочники из фикстуры в формате dumpdata. Возвращает отчет по каждой модели."""
+    natural_keys = natural_keys or SYNC_NATURAL_KEYS
+    with open(path, encoding='utf-8') as file:
+        objects = json.load(file)
+
+    records = {label: [] for label in natural_keys}
+    for obj in objects:
+        if obj['model'] in records:
+            records[obj['model']].append(obj['fields'])
+
+    return {
+        label: sync_model(apps.get_model(label), natural_keys[label], model_records)
+        for label, model_records in records.items()
+    }
@@ -0,0 +1,170 @@
+import random
+import re
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections, transaction
+from django.db.utils import load_backend
+from django.test import Client
+from django.utils import timezone
+
+from catalog.delivery import MailDelivery
+from catalog.models import Product
+from catalog.moderation import build_pattern
+from catalog.paginators import KeysetPaginator
+from catalog.search import search_products
+from users.models import User, EmailVerification
+from users.services import hash_token
+
+
+def measure(func, repeat):
+    """Возвращает среднее время выполнения func в миллисекундах."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) * 1000 / repeat
+
+
+class Command(BaseCommand):
+    help = 'Замеры производительности отдельных подсистем каталога'
+
+    def add_arguments(self, parser):
+        parser.add_argument('target', choices=['pagination', 'mailing', 'tokens', 'moderation', 'search', 'connections'])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page', type=int, action='append', dest='pages',
+                            help='Номер страницы для замера (можно указать несколько раз)')
+        parser.add_argument('--per-page', type=int, default=5)
+        parser.add_argument('--recipients', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--concurrency', type=int, default=None)
+        parser.add_argument('--users', type=int, action='append', dest='user_counts',
+                            help='Число кодов подтверждения в таблице (можно указать несколько раз)')
+        parser.add_argument('--terms', type=int, default=10000)
+        parser.add_argument('--text-size', type=int, default=50_000, help='Размер описания в символах')
+        parser.add_argument('--query', action='append', dest='queries', help='Поисковая строка (можно указать несколько раз)')
+        parser.add_argument('--url', default='/products/', help='Страница для замера задержки запросов')
+        parser.add_argument('--backend', default='django.core.mail.backends.locmem.EmailBackend',
+                            help='Почтовый бэкенд, для замеров с SMTP-заглушкой (aiosmtpd) - smtp.EmailBackend')
+
+    def handle(self, *args, **options):
+        getattr(self, f'bench_{options["target"]}')(**options)
+
+    def bench_pagination(self, repeat, pages, per_page, **options):
+        queryset = Product.objects.all()
+        ordering = settings.PRODUCTS_KEYSET_ORDERING
+        total = queryset.count()
+        pages = pages or [1, 10, 100, 1000]
+        self.stdout.write(f'Товаров: {total}, на странице: {per_page}')
+
+        for number in pages:
+            offset = (number - 1) * per_page
+            if offset >= total:
+                self.stdout.write(f'Страница {number}: нет данных')
+                continue
+
+            def offset_page():
+                page = Paginator(queryset.order_by(*ordering), per_page).page(number)
+                list(page.object_list)
+
+            # Курсор на начало страницы N: последняя запись страницы N - 1
+            keyset = KeysetPaginator(queryset, per_page, ordering=ordering)
+            cursor = None
+            if offset:
+                boundary = queryset.order_by(*ordering)[offset - 1]
+                cursor = keyset.encode_cursor(boundary, reverse=False)
+
+            offset_ms = measure(offset_page, repeat)
+            keyset_ms = measure(lambda: keyset.page(cursor), repeat)
+            self.stdout.write(f'Страница {number}: offset {offset_ms:.2f} мс, keyset {keyset_ms:.2f} мс')
+
+    def bench_mailing(self, recipients, batch_size, concurrency, backend, **options):
+        emails = ((None, f'client{i}@example.com') for i in range(recipients))
+        delivery = MailDelivery(batch_size=batch_size, concurrency=concurrency, backend=backend)
+        started = time.perf_counter()
+        result = delivery.send(emails, 'Тест', 'Тестовое письмо', from_email='bench@example.com')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{result} за {elapsed:.2f} с ({result.sent / elapsed:.0f} писем/с), '
+                          f'пачка {delivery.batch_size}, соединений {delivery.concurrency}')
+
+    def bench_tokens(self, repeat, user_counts, **options):
+        expires_at = timezone.now() + timedelta(days=1)
+        for count in user_counts or [1000, 10000, 100000]:
+            # Данные замера откатываются вместе с транзакцией, а уникальный адрес не пересекается
+            # с пользователями, оставшимися от прерванного запуска или созданными вручную
+            with transaction.atomic():
+                user = User.objects.create(email=f'bench-tokens-{uuid.uuid4().hex}@example.com')
+                EmailVerification.objects.bulk_create(
+                    (EmailVerification(user=user, token_hash=hash_token(f'token{i}'), expires_at=expires_at)
+                     for i in range(count)),
+                    batch_size=5000,
+                )
+                token_hash = hash_token(f'token{count // 2}')
+                lookup_ms = measure(
+                    lambda: EmailVerification.objects.filter(token_hash=token_hash, expires_at__gt=timezone.now())
+                    .select_related('user').first(),
+                    repeat,
+                )
+                self.stdout.write(f'Кодов: {count}, поиск кода {lookup_ms:.3f} мс')
+                transaction.set_rollback(True)
+
+    def bench_moderation(self, repeat, terms, text_size, **options):
+        alphabet = 'абвгдеежзийклмнопрстуфхцчшщъыьэюя'
+        rng = random.Random(0)
+        words = {''.join(rng.choices(alphabet, k=rng.randint(5, 12))) for _ in range(terms)}
+        text = ' '.join(''.join(rng.choices(alphabet, k=rng.randint(3, 10))) for _ in range(text_size // 7))[:text_size]
+
+        started = time.perf_counter()
+        regex = re.compile(build_pattern(words))
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        naive_ms = measure(lambda: any(word in text for word in words), repeat)
+        regex_ms = measure(lambda: regex.search(text), repeat)
+        self.stdout.write(f'Слов: {len(words)}, текст: {len(text)} символов, сборка выражения {compile_ms:.1f} мс')
+        self.stdout.write(f'Перебор слов: {naive_ms:.2f} мс, одно выражение: {regex_ms:.2f} мс')
+
+    def bench_search(self, repeat, queries, per_page, **options):
+        queries = queries or ['машина', 'стиральная машина', 'чайник -электрический']
+        self.stdout.write(f'Товаров: {Product.objects.count()}')
+        for query in queries:
+            # первая страница выдачи, как в ProductSearchView
+            elapsed = measure(lambda: list(search_products(query, Product.objects.for_listing())[:per_page]), repeat)
+            self.stdout.write(f'"{query}": {elapsed:.2f} мс')
+
+    def bench_connections(self, repeat, url, **options):
+        """
+        Задержка запроса к странице с обычным бэкендом PostgreSQL (новое соединение на запрос и
+        постоянные соединения) и с пулом config.db. Соединение 'default' на время замера подменяется.
+        """
+        base = connections.settings[DEFAULT_DB_ALIAS]
+        if base['ENGINE'] not in ('django.db.backends.postgresql', 'config.db'):
+            raise CommandError('Замер соединений имеет смысл только для PostgreSQL')
+        plain_options = {key: value for key, value in base['OPTIONS'].items() if key != 'pool'}
+        pool_options = base['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 10}
+        variants = [
+            ('postgresql, новое соединение на запрос', 'django.db.backends.postgresql', 0, plain_options),
+            ('postgresql, CONN_MAX_AGE=60', 'django.db.backends.postgresql', 60, plain_options),
+            ('config.db, пул соединений', 'config.db', 0, {**plain_options, 'pool': pool_options}),
+        ]
+
+        client = Client(HTTP_HOST='localhost')
+
+        def request():
+            client.get(url)
+            # то же, что делает обработчик request_finished после каждого запроса
+            close_old_connections()
+
+        original = connections[DEFAULT_DB_ALIAS]
+        original.close()
+        try:
+            for label, engine, max_age, engine_options in variants:
+                settings_dict = {**base, 'ENGINE': engine, 'CONN_MAX_AGE': max_age, 'OPTIONS': engine_options}
+                connections[DEFAULT_DB_ALIAS] = load_backend(engine).DatabaseWrapper(settings_dict, DEFAULT_DB_ALIAS)
+                request()  # прогрев шаблонов, кешей и пула
+                self.stdout.write(f'{label}: {measure(request, repeat):.2f} мс')
+                connections[DEFAULT_DB_ALIAS].close()
+        finally:
+            connections[DEFAULT_DB_ALIAS] = original
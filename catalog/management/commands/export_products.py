@@ -0,0 +1,28 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from catalog.exporters import FORMATS, export_products
+
+
+class Command(BaseCommand):
+    help = 'Streams the product catalog to a CSV or JSON Lines file (stdout by default).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Файл выгрузки, по умолчанию stdout')
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, output, format, gzip, chunk_size, **options):
+        chunks = export_products(format, compress=gzip, chunk_size=chunk_size)
+        if output is None:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Каталог выгружен в {output}'))
@@ -1,15 +1,38 @@
 from django.core.management import BaseCommand
 from django.core.management import call_command
+from catalog.cache import category_cache, product_facet_cache
+from catalog.importers import sync_fixture
 from catalog.models import Category
+from catalog.services import touch_category_products
 
 
 class Command(BaseCommand):
 
-    def handle(self, *args, **options):
+    def add_arguments(self, parser):
+        parser.add_argument('fixture', nargs='?', default='data.json')
+        parser.add_argument('--reload', action='store_true',
+                            help='Старый режим: удалить все категории (вместе с товарами) и загрузить фикстуру заново')
+
+    def handle(self, *args, fixture, reload, **options):
+        if not reload:
+            # по умолчанию меняем только отличающиеся от фикстуры записи
+            reports = sync_fixture(fixture)
+            for label, report in reports.items():
+                self.stdout.write(f'{label}: добавлено {report["inserted"]}, обновлено {report["updated"]}, '
+                                  f'без изменений {report["unchanged"]}')
+            # bulk-операции не отправляют сигналы, кеш категорий и даты изменения товаров обновляем сами
+            categories = reports['catalog.category']
+            if categories['inserted'] or categories['updated']:
+                category_cache.invalidate()
+                product_facet_cache.invalidate()
+            if 'name' in categories['updated_fields']:
+                touch_category_products(categories['updated_pks'])
+            return
+
         # удаляю, как в shell
         Category.objects.all().delete()
         # вызываю фикстуру
-        call_command('loaddata', 'data.json')
+        call_command('loaddata', fixture)
         # получаю все объекты из БД
         categories = Category.objects.all()
         categories_for_create = []
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from catalog.counters import view_counter
+
+
+class Command(BaseCommand):
+    help = 'Переносит накопленные в кеше просмотры записей блога в базу данных'
+
+    def handle(self, *args, **options):
+        updated = view_counter.flush()
+        self.stdout.write(f'Обновлено записей блога: {updated}')
@@ -0,0 +1,44 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalog.models import Product, BlogPost
+from catalog.thumbnails import generate_thumbnails, generate_queued_thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Generates preview thumbnails for existing products and blog posts in a process pool.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--force', action='store_true', help='Пересоздать уже существующие миниатюры')
+        parser.add_argument('--queued', action='store_true',
+                            help='Обработать только очередь новых превью (то же делает run_scheduler)')
+
+    def handle(self, *args, processes, force, queued, **options):
+        if queued:
+            processed = 0
+            while count := generate_queued_thumbnails():
+                processed += count
+            self.stdout.write(self.style.SUCCESS(f'Обработано превью из очереди: {processed}'))
+            return
+
+        names = set()
+        for model in (Product, BlogPost):
+            names.update(model.objects.exclude(preview='').exclude(preview__isnull=True)
+                         .values_list('preview', flat=True))
+
+        # Дочерние процессы работают только с файлами, соединения с базой им не нужны
+        connections.close_all()
+        started = time.perf_counter()
+        created = 0
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for thumbnails in executor.map(generate_thumbnails, sorted(names), [force] * len(names), chunksize=8):
+                created += len(thumbnails)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений: {len(names)}, миниатюр: {created}, время: {elapsed:.1f} с'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.importers import FORMATS, ProductImporter, ProductImportError, detect_format, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Streams products from a JSON Lines or CSV file into the database in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, help='По умолчанию определяется по расширению файла')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--user', help='Почта создателя для строк без поля user')
+        parser.add_argument('--create-categories', action='store_true', help='Создавать отсутствующие категории')
+        parser.add_argument('--copy', action='store_true', help='Загружать пачки через COPY (PostgreSQL)')
+
+    def progress(self, imported, errors, elapsed):
+        self.stdout.write(f'Загружено: {imported}, ошибок: {errors}, {imported / max(elapsed, 1e-9):.0f} строк/с')
+
+    def handle(self, *args, path, format, batch_size, user, create_categories, copy, **options):
+        try:
+            file_format = format or detect_format(path)
+            importer = ProductImporter(batch_size=batch_size, default_user=user,
+                                       create_categories=create_categories, use_copy=copy)
+            with open(path, encoding='utf-8', newline='') as file:
+                imported, errors, elapsed = importer.run(read_rows(file, file_format), progress=self.progress)
+        except (OSError, ProductImportError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {imported} товаров за {elapsed:.1f} с, пропущено строк: {errors}'))
@@ -0,0 +1,43 @@
+import logging
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from catalog.tasks import worker_loop
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Runs a pool of workers that send queued mailings (MAILING_DISPATCH = 'queue')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--check-interval', type=float, default=5,
+                            help='How often to check for dead workers and restart them, in seconds')
+
+    def start_worker(self):
+        # Соединения с базой не должны наследоваться дочерними процессами
+        connections.close_all()
+        worker = multiprocessing.Process(target=worker_loop, daemon=True)
+        worker.start()
+        return worker
+
+    def handle(self, *args, processes, check_interval, **options):
+        workers = [self.start_worker() for _ in range(processes)]
+        logger.info("Started %s mailing workers", processes)
+
+        try:
+            while True:
+                for index, worker in enumerate(workers):
+                    if not worker.is_alive():
+                        # воркер упал (например, OOM или ошибка вне цикла), его задачу вернет requeue_stale_tasks
+                        logger.warning("Mailing worker %s exited with code %s, restarting", worker.pid, worker.exitcode)
+                        workers[index] = self.start_worker()
+                time.sleep(check_interval)
+        except KeyboardInterrupt:
+            logger.info("Stopping mailing workers...")
+            for worker in workers:
+                worker.terminate()
@@ -1,15 +1,19 @@
 import logging
+import time
 
 from django.conf import settings
 
-from apscheduler.schedulers.blocking import BlockingScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.interval import IntervalTrigger
 from django.core.management.base import BaseCommand
 from django_apscheduler.jobstores import DjangoJobStore
 from django_apscheduler.models import DjangoJobExecution
 from django_apscheduler import util
 
-from catalog.services import add_jobs
+from catalog.counters import view_counter
+from catalog.scheduler import sync_jobs, apply_changes
+from catalog.thumbnails import generate_queued_thumbnails
+from users.services import send_queued_emails as send_outgoing_emails, purge_expired_verifications
 
 logger = logging.getLogger(__name__)
 
@@ -30,17 +34,88 @@ def delete_old_job_executions(max_age=604_800):
     DjangoJobExecution.objects.delete_old_job_executions(max_age)
 
 
+@util.close_old_connections
+def flush_view_counts():
+    """
+    This job moves blog post views accumulated in the cache to the database.
+    """
+    view_counter.flush()
+
+
+@util.close_old_connections
+def generate_thumbnails():
+    """
+    This job creates thumbnails for previews queued on product and blog post save.
+    """
+    while generate_queued_thumbnails():
+        pass
+
+
+@util.close_old_connections
+def send_queued_emails():
+    """
+    This job sends verification and password e-mails queued by the users app.
+    """
+    while send_outgoing_emails():
+        pass
+
+
+@util.close_old_connections
+def delete_expired_verifications():
+    """
+    This job deletes expired e-mail verification codes in batches.
+    """
+    purge_expired_verifications()
+
+
 class Command(BaseCommand):
     help = "Runs APScheduler."
 
     def handle(self, *args, **options):
-        scheduler = BlockingScheduler(timezone=settings.TIME_ZONE)
+        # Фоновый планировщик: задачи рассылок сверяются с хранилищем уже после его запуска
+        scheduler = BackgroundScheduler(timezone=settings.TIME_ZONE)
         scheduler.add_jobstore(DjangoJobStore(), "default")
-        add_jobs(scheduler)
+        scheduler.add_job(
+            flush_view_counts,
+            trigger=IntervalTrigger(seconds=settings.BLOG_VIEWS_FLUSH_INTERVAL),
+            id="flush_view_counts",
+            max_instances=1,
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            generate_thumbnails,
+            trigger=IntervalTrigger(seconds=settings.THUMBNAIL_QUEUE_POLL_INTERVAL),
+            id="generate_thumbnails",
+            max_instances=1,
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            send_queued_emails,
+            trigger=IntervalTrigger(seconds=settings.OUTGOING_EMAIL_POLL_INTERVAL),
+            id="send_queued_emails",
+            max_instances=1,
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            delete_expired_verifications,
+            trigger=IntervalTrigger(hours=1),
+            id="delete_expired_verifications",
+            max_instances=1,
+            replace_existing=True,
+        )
 
         try:
             logger.info("Starting scheduler...")
             scheduler.start()
+            report = sync_jobs(scheduler)
+            self.stdout.write(f"Mailing jobs synced: {report}")
+            # Изменения рассылок из веб-интерфейса приходят через очередь MailingChange
+            while True:
+                time.sleep(settings.SCHEDULER_POLL_INTERVAL)
+                try:
+                    apply_changes(scheduler)
+                except Exception:
+                    logger.exception("Failed to apply mailing changes")
         except KeyboardInterrupt:
             logger.info("Stopping scheduler...")
             scheduler.shutdown()
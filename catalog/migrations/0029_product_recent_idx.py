@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0028_alter_product_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-last_change_date', 'id'], name='product_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0029_product_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='last_change_date',
+            field=models.DateTimeField(verbose_name='Дата последнего изменения'),
+        ),
+    ]
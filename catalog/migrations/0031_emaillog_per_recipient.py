@@ -0,0 +1,37 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0030_alter_product_last_change_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emaillog',
+            name='server_response',
+            field=models.TextField(blank=True, null=True, verbose_name='Ответ сервера'),
+        ),
+        migrations.RemoveField(
+            model_name='emaillog',
+            name='client',
+        ),
+        migrations.AlterField(
+            model_name='emaillog',
+            name='status',
+            field=models.CharField(choices=[('STATUS_OK', 'Успешно'), ('STATUS_FAILED', 'Ошибка')], default='STATUS_OK', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='emaillog',
+            index=models.Index(fields=['settings', 'datetime_attempt'], name='emaillog_settings_attempt_idx'),
+        ),
+        migrations.AddField(
+            model_name='emaillog',
+            name='client',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='catalog.client', verbose_name='Клиент'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0031_emaillog_per_recipient'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mailing_id', models.PositiveBigIntegerField(verbose_name='Рассылка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение рассылки',
+                'verbose_name_plural': 'Изменения рассылок',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0032_mailingchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailingTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='queued', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('worker', models.CharField(blank=True, max_length=100, null=True, verbose_name='Воркер')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало выполнения')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание выполнения')),
+                ('mailing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='catalog.mailingsettings', verbose_name='Рассылка')),
+            ],
+            options={
+                'verbose_name': 'Задача рассылки',
+                'verbose_name_plural': 'Задачи рассылок',
+                'indexes': [models.Index(fields=['status', 'id'], name='mailingtask_status_idx')],
+            },
+        ),
+    ]
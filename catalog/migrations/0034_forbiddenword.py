@@ -0,0 +1,33 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+FORBIDDEN_WORDS = ['казино', 'криптовалюта', 'крипта', 'биржа', 'дешево', 'бесплатно', 'обман', 'полиция', 'радар']
+
+
+def add_forbidden_words(apps, schema_editor):
+    # Слова, которые раньше были зашиты в CreateProductForm
+    ForbiddenWord = apps.get_model('catalog', 'ForbiddenWord')
+    ForbiddenWord.objects.bulk_create([ForbiddenWord(word=word) for word in FORBIDDEN_WORDS], ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0033_mailingtask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForbiddenWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100, unique=True, verbose_name='Слово')),
+            ],
+            options={
+                'verbose_name': 'Запрещенное слово',
+                'verbose_name_plural': 'Запрещенные слова',
+            },
+        ),
+        migrations.RunPython(add_forbidden_words, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:02
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+CREATE_SEARCH_SQL = """
+CREATE OR REPLACE FUNCTION catalog_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER catalog_product_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, description ON catalog_product
+    FOR EACH ROW EXECUTE FUNCTION catalog_product_search_vector_update();
+
+UPDATE catalog_product SET search_vector =
+    setweight(to_tsvector('russian', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'B');
+
+CREATE INDEX catalog_product_search_idx ON catalog_product USING gin (search_vector);
+"""
+
+DROP_SEARCH_SQL = """
+DROP INDEX IF EXISTS catalog_product_search_idx;
+DROP TRIGGER IF EXISTS catalog_product_search_vector_trigger ON catalog_product;
+DROP FUNCTION IF EXISTS catalog_product_search_vector_update();
+"""
+
+
+def create_search(apps, schema_editor):
+    # Триггер и GIN-индекс есть только в PostgreSQL, на SQLite поиск работает через icontains
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_SEARCH_SQL)
+
+
+def drop_search(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_SEARCH_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0034_forbiddenword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(create_search, drop_search),
+    ]
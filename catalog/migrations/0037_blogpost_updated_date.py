@@ -0,0 +1,18 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0036_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
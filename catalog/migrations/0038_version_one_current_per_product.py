@@ -0,0 +1,32 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:07
+
+from django.db import migrations, models
+
+
+def keep_one_current_version(apps, schema_editor):
+    """Оставляет текущей только одну версию товара: активную версию товара, а если ее нет - последнюю."""
+    Product = apps.get_model('catalog', 'Product')
+    Version = apps.get_model('catalog', 'Version')
+    duplicated = (Version.objects.filter(is_current=True).values('product_id')
+                  .annotate(current=models.Count('pk')).filter(current__gt=1).values_list('product_id', flat=True))
+    for product_id in duplicated:
+        current = Version.objects.filter(product_id=product_id, is_current=True)
+        active_id = Product.objects.filter(pk=product_id).values_list('active_version_id', flat=True).first()
+        if not current.filter(pk=active_id).exists():
+            active_id = current.order_by('-pk').values_list('pk', flat=True).first()
+        current.exclude(pk=active_id).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0037_blogpost_updated_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_current_version, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='version',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_current', True)), fields=('product',), name='version_one_current_per_product'),
+        ),
+    ]
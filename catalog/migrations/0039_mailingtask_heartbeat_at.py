@@ -0,0 +1,26 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:19
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_heartbeat(apps, schema_editor):
+    # У выполняющихся задач отметкой считаем время запуска
+    MailingTask = apps.get_model('catalog', 'MailingTask')
+    MailingTask.objects.filter(status='running').update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0038_version_one_current_per_product'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mailingtask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Последняя отметка воркера'),
+        ),
+        migrations.RunPython(fill_heartbeat, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0039_mailingtask_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл превью')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Добавлено')),
+            ],
+            options={
+                'verbose_name': 'Превью без миниатюр',
+                'verbose_name_plural': 'Превью без миниатюр',
+            },
+        ),
+    ]
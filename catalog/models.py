@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.utils import timezone
 
@@ -11,6 +12,13 @@ class Category(models.Model):
     description = models.TextField(verbose_name='Описание', **NULLABLE)
     objects = models.Manager()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # название из базы: сигнал обновляет товары категории, только если оно изменилось
+        instance._loaded_name = dict(zip(field_names, values)).get('name')
+        return instance
+
     def __str__(self):
         return f'{self.name}: {self.description}'
 
@@ -19,6 +27,28 @@ class Category(models.Model):
         verbose_name_plural = 'Категории'
 
 
+class ForbiddenWord(models.Model):
+    word = models.CharField(max_length=100, unique=True, verbose_name='Слово')
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.word
+
+    class Meta:
+        verbose_name = 'Запрещенное слово'
+        verbose_name_plural = 'Запрещенные слова'
+
+
+class ProductQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Товары для карточек в списках: категория и активная версия одним запросом, только нужные поля."""
+        return self.select_related('category', 'active_version').only(
+            'id', 'name', 'description', 'preview', 'price', 'last_change_date', 'is_published',
+            'category__id', 'category__name',
+            'active_version__id', 'active_version__version_number',
+        )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=100, verbose_name='Наименование')
     description = models.TextField(verbose_name='Описание', **NULLABLE)
@@ -26,16 +56,18 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, verbose_name='Категория')
     price = models.DecimalField(max_digits=8, decimal_places=2, verbose_name='Цена')
     creation_date = models.DateField(verbose_name='Дата создания')
-    last_change_date = models.DateField(verbose_name='Дата последнего изменения')
+    last_change_date = models.DateTimeField(verbose_name='Дата последнего изменения')
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Создатель')
     active_version = models.OneToOneField('Version', related_name='+', **NULLABLE, on_delete=models.SET_NULL)
     is_published = models.BooleanField(default=False)
-    objects = models.Manager()
+    # Заполняется триггером в PostgreSQL, см. catalog.search
+    search_vector = SearchVectorField(editable=False, **NULLABLE)
+    objects = ProductQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         if not self.creation_date:
             self.creation_date = timezone.now().date()
-        self.last_change_date = timezone.now().date()
+        self.last_change_date = timezone.now()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -50,6 +82,15 @@ class Product(models.Model):
 
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
+        indexes = [
+            # для курсорной пагинации по ('-last_change_date', 'id')
+            models.Index(fields=['-last_change_date', 'id'], name='product_recent_idx'),
+            # фильтры и сортировки списка товаров, см. catalog.filters
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', '-last_change_date', 'id'], name='product_category_recent_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            models.Index(fields=['is_published', '-last_change_date', 'id'], name='product_published_recent_idx'),
+        ]
 
 
 class Contact(models.Model):
@@ -72,6 +113,7 @@ class BlogPost(models.Model):
     content = models.TextField(verbose_name='Содержимое')
     preview = models.ImageField(upload_to='blog_previews/', verbose_name='Превью', **NULLABLE)
     created_date = models.DateTimeField(auto_now_add=True)
+    updated_date = models.DateTimeField(auto_now=True)
     is_published = models.BooleanField(default=True)
     views_count = models.IntegerField(default=0)
 
@@ -140,14 +182,59 @@ class MailingSettings(models.Model):
         verbose_name_plural = 'Рассылки'
 
 
+class MailingChange(models.Model):
+    """Очередь изменений рассылок для планировщика (пишется сигналами в той же транзакции)."""
+    mailing_id = models.PositiveBigIntegerField(verbose_name='Рассылка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'Изменение рассылки {self.mailing_id}'
+
+    class Meta:
+        verbose_name = 'Изменение рассылки'
+        verbose_name_plural = 'Изменения рассылок'
+
+
+class MailingTask(models.Model):
+    """Задача на отправку рассылки для пула воркеров run_mailing_workers."""
+    STATUSES = (
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    )
+    mailing = models.ForeignKey(MailingSettings, on_delete=models.CASCADE, verbose_name='Рассылка')
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued', verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')
+    worker = models.CharField(max_length=100, verbose_name='Воркер', **NULLABLE)
+    error = models.TextField(verbose_name='Ошибка', **NULLABLE)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    started_at = models.DateTimeField(verbose_name='Начало выполнения', **NULLABLE)
+    heartbeat_at = models.DateTimeField(verbose_name='Последняя отметка воркера', **NULLABLE)
+    finished_at = models.DateTimeField(verbose_name='Окончание выполнения', **NULLABLE)
+    objects = models.Manager()
+
+    def __str__(self):
+        return f'Рассылка {self.mailing_id} - {self.status}'
+
+    class Meta:
+        verbose_name = 'Задача рассылки'
+        verbose_name_plural = 'Задачи рассылок'
+        indexes = [
+            models.Index(fields=['status', 'id'], name='mailingtask_status_idx'),
+        ]
+
+
 class EmailLog(models.Model):
     STATUSES = (
         ('STATUS_OK', 'Успешно'),
         ('STATUS_FAILED', 'Ошибка'),
     )
     datetime_attempt = models.DateTimeField(auto_now_add=True, verbose_name='Последняя попытка')
-    status = models.CharField(choices=STATUSES, default='STATUS_OK', verbose_name='Статус')
-    client = models.ManyToManyField(Client, verbose_name='Клиент')
+    status = models.CharField(max_length=20, choices=STATUSES, default='STATUS_OK', verbose_name='Статус')
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, verbose_name='Клиент', **NULLABLE)
+    server_response = models.TextField(verbose_name='Ответ сервера', **NULLABLE)
     settings = models.ForeignKey(MailingSettings, on_delete=models.CASCADE, verbose_name='Настройки', **NULLABLE)
     objects = models.Manager()
 
@@ -157,6 +244,9 @@ class EmailLog(models.Model):
     class Meta:
         verbose_name = 'Лог рассылки'
         verbose_name_plural = 'Логи рассылки'
+        indexes = [
+            models.Index(fields=['settings', 'datetime_attempt'], name='emaillog_settings_attempt_idx'),
+        ]
 
 
 class Version(models.Model):
@@ -169,3 +259,24 @@ class Version(models.Model):
 
     def __str__(self):
         return f"{self.product} - {self.version_number}"
+
+    class Meta:
+        constraints = [
+            # не больше одной текущей версии у товара, переключение - catalog.services.save_version
+            models.UniqueConstraint(fields=['product'], condition=models.Q(is_current=True),
+                                    name='version_one_current_per_product'),
+        ]
+
+
+class ThumbnailQueue(models.Model):
+    """Очередь превью, для которых нужно создать миниатюры (пишется сигналами, разбирается планировщиком)."""
+    name = models.CharField(max_length=255, unique=True, verbose_name='Файл превью')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Добавлено')
+    objects = models.Manager()
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        verbose_name = 'Превью без миниатюр'
+        verbose_name_plural = 'Превью без миниатюр'
@@ -0,0 +1,95 @@
+import os
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from catalog.models import ForbiddenWord
+
+
+def build_pattern(words):
+    """
+    Собирает регулярное выражение из слов в виде префиксного дерева:
+    'крипта', 'криптовалюта' -> 'крипт(?:а|овалюта)'. Общие префиксы проверяются один раз,
+    поэтому поиск идет за один проход по тексту даже при тысячах слов.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def to_regex(node):
+        # слово закончилось в этом узле: для поиска подстроки продолжение уже не важно
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items())]
+        if len(branches) == 1:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')'
+
+    return to_regex(trie)
+
+
+class ForbiddenWordMatcher:
+    """
+    Проверка текста на запрещенные слова.
+
+    Слова берутся из таблицы ForbiddenWord и файла FORBIDDEN_WORDS_FILE (по слову в строке)
+    и компилируются в одно регулярное выражение на процесс. Раз в ``check_interval`` секунд
+    сверяются максимальный id и число слов в таблице, поколение в кеше (меняется сигналами
+    ForbiddenWord) и время изменения файла, при изменениях выражение пересобирается.
+    Добавление и удаление слов видно по базе даже с process-local кешем, правка слова на месте -
+    только через общий кеш или по сигналу в этом же процессе.
+    """
+    generation_key = 'forbidden_words:generation'
+
+    def __init__(self, path=None, check_interval=None):
+        self.path = settings.FORBIDDEN_WORDS_FILE if path is None else path
+        self.check_interval = settings.FORBIDDEN_WORDS_CHECK_INTERVAL if check_interval is None else check_interval
+        self._regex = None
+        self._version = None
+        self._checked_at = 0
+
+    def _current_version(self):
+        mtime = os.path.getmtime(self.path) if self.path and os.path.exists(self.path) else None
+        table = ForbiddenWord.objects.aggregate(last_id=Max('pk'), count=Count('pk'))
+        return table['last_id'], table['count'], cache.get(self.generation_key, 0), mtime
+
+    def load_words(self):
+        words = set(ForbiddenWord.objects.values_list('word', flat=True))
+        if self.path and os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as file:
+                words.update(line.strip() for line in file)
+        return {word.lower() for word in words if word}
+
+    def get_regex(self):
+        if self._version is None or time.monotonic() - self._checked_at >= self.check_interval:
+            version = self._current_version()
+            if version != self._version:
+                words = self.load_words()
+                self._regex = re.compile(build_pattern(words)) if words else None
+                self._version = version
+            self._checked_at = time.monotonic()
+        return self._regex
+
+    def search(self, text):
+        """Возвращает первое найденное запрещенное слово или None."""
+        regex = self.get_regex()
+        if not text or regex is None:
+            return None
+        match = regex.search(text.lower())
+        return match.group() if match else None
+
+    def invalidate(self):
+        self._version = None
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:
+            cache.set(self.generation_key, int(time.time() * 1000), None)
+
+
+forbidden_words = ForbiddenWordMatcher()
@@ -0,0 +1,132 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder обрезает время до миллисекунд, а курсор должен совпадать с базой точно:
+    иначе строки с одной и той же отметкой времени (например, из одного импорта) пропускаются.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу (cursor pagination): вместо OFFSET и COUNT(*) страница выбирается
+    условием "строго после/до последней записи предыдущей страницы" по уникальному упорядочиванию.
+
+    :param ordering: поля сортировки, последним должно идти уникальное поле (обычно id),
+                     например ('id',) или ('-last_change_date', 'id').
+    """
+
+    def __init__(self, queryset, per_page, ordering=('id',)):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, reverse):
+        values = [getattr(obj, name) for name in self.fields]
+        data = json.dumps({'v': values, 'r': reverse}, cls=CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = data['v']
+            reverse = bool(data['r'])
+        except (ValueError, TypeError, KeyError, binascii.Error):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        opts = self.queryset.model._meta
+        try:
+            values = [opts.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return values, reverse
+
+    def _seek_filter(self, values, reverse):
+        # (a, b) > (x, y)  =>  a > x OR (a = x AND b > y), с учетом направления каждого поля
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            lookup = 'gt' if self.descending[i] == reverse else 'lt'
+            term = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                term &= Q(**{prev_name: prev_value})
+            condition |= term
+        return condition
+
+    def _order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering)
+
+    def page(self, cursor=None):
+        queryset = self.queryset
+        reverse = False
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        rows = list(queryset.order_by(*self._order_by(reverse))[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], reverse=False)
+            if cursor and (has_more or not reverse):
+                previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,140 @@
+import logging
+import time
+
+from apscheduler.triggers.cron import CronTrigger
+from django.conf import settings
+from django.utils import timezone
+from django_apscheduler import util
+
+from catalog.models import MailingSettings, MailingChange
+from catalog.services import sending_mail
+from catalog.tasks import enqueue_mailing
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = 'mailing_'
+
+
+def job_id(mailing_id):
+    return f'{JOB_PREFIX}{mailing_id}'
+
+
+def is_mailing_job(job):
+    # числовые id остались от старой регистрации задач по pk рассылки
+    return job.id.startswith(JOB_PREFIX) or job.id.isdigit()
+
+
+def build_trigger(mailing_setting):
+    hours, minutes = mailing_setting.start_time.hour, mailing_setting.start_time.minute
+    if mailing_setting.frequency == 'daily':
+        fields = {'day': '*'}
+    elif mailing_setting.frequency == 'weekly':
+        fields = {'day_of_week': 'mon'}
+    else:
+        fields = {'day': '1'}
+    return CronTrigger(hour=hours, minute=minutes, start_date=mailing_setting.start_time,
+                       end_date=mailing_setting.end_time, timezone=settings.TIME_ZONE, **fields)
+
+
+def active_mailings():
+    """Запущенные рассылки, у которых еще не наступило время окончания."""
+    return MailingSettings.objects.filter(status='running', end_time__gt=timezone.now())
+
+
+def complete_finished_mailings():
+    return MailingSettings.objects.filter(status='running', end_time__lte=timezone.now()).update(status='completed')
+
+
+@util.close_old_connections
+def send_mailing_job(mailing_id):
+    """
+    Задача планировщика: рассылка читается из базы в момент запуска,
+    поэтому изменения настроек и статуса учитываются без перерегистрации.
+    """
+    mailing_setting = active_mailings().select_related('message').filter(pk=mailing_id).first()
+    if mailing_setting is None:
+        logger.info('Рассылка %s не активна, пропускаем', mailing_id)
+        return
+    if settings.MAILING_DISPATCH == 'queue':
+        # отправкой займутся воркеры run_mailing_workers, планировщик не блокируется
+        enqueue_mailing(mailing_id)
+        return
+    sending_mail(mailing_setting)
+
+
+def schedule_mailing(scheduler, mailing_setting, existing=None):
+    """
+    Регистрирует задачу одной рассылки. Возвращает 'added', 'updated' или 'unchanged'
+    в зависимости от того, что пришлось сделать с задачей ``existing`` из хранилища.
+    """
+    trigger = build_trigger(mailing_setting)
+    if existing is not None:
+        if repr(existing.trigger) == repr(trigger):
+            return 'unchanged'
+        scheduler.reschedule_job(existing.id, trigger=trigger)
+        return 'updated'
+
+    scheduler.add_job(
+        send_mailing_job,
+        trigger=trigger,
+        id=job_id(mailing_setting.pk),
+        max_instances=1,
+        replace_existing=True,
+        args=(mailing_setting.pk,),
+    )
+    return 'added'
+
+
+def sync_jobs(scheduler):
+    """
+    Приводит задачи рассылок в хранилище планировщика к состоянию базы: каждая активная рассылка
+    регистрируется ровно один раз, меняются только отличающиеся задачи, лишние удаляются.
+    Возвращает отчет с количеством изменений и временем синхронизации.
+    """
+    started = time.perf_counter()
+    report = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'completed': complete_finished_mailings()}
+
+    existing = {job.id: job for job in scheduler.get_jobs() if is_mailing_job(job)}
+    for mailing_setting in active_mailings().only('pk', 'start_time', 'end_time', 'frequency'):
+        action = schedule_mailing(scheduler, mailing_setting, existing.pop(job_id(mailing_setting.pk), None))
+        report[action] += 1
+
+    for stale_id in existing:
+        scheduler.remove_job(stale_id)
+        report['removed'] += 1
+
+    report['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info('Синхронизация задач рассылок: %s', report)
+    return report
+
+
+def sync_mailing(scheduler, mailing_id):
+    """Перерегистрирует задачу одной рассылки: добавляет, обновляет или удаляет ее."""
+    existing = scheduler.get_job(job_id(mailing_id))
+    mailing_setting = active_mailings().only('pk', 'start_time', 'end_time', 'frequency').filter(
+        pk=mailing_id).first()
+    if mailing_setting is not None:
+        return schedule_mailing(scheduler, mailing_setting, existing)
+    if existing is not None:
+        scheduler.remove_job(existing.id)
+        return 'removed'
+    return 'unchanged'
+
+
+@util.close_old_connections
+def apply_changes(scheduler, limit=500):
+    """
+    Обрабатывает очередь MailingChange: каждая измененная рассылка синхронизируется один раз,
+    обработанные записи удаляются. Возвращает количество обработанных рассылок.
+    """
+    changes = list(MailingChange.objects.order_by('pk').values_list('pk', 'mailing_id')[:limit])
+    if not changes:
+        return 0
+
+    mailing_ids = {mailing_id for _, mailing_id in changes}
+    for mailing_id in mailing_ids:
+        action = sync_mailing(scheduler, mailing_id)
+        logger.info('Рассылка %s: задача %s', mailing_id, action)
+    # удаляем именно прочитанные записи: запись с меньшим pk могла закоммититься позже
+    MailingChange.objects.filter(pk__in=[pk for pk, _ in changes]).delete()
+    return len(mailing_ids)
@@ -0,0 +1,33 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import Case, F, FloatField, Q, Value, When
+
+from catalog.models import Product
+
+# Должен совпадать с конфигурацией в триггере из миграции 0035_product_search_vector
+SEARCH_CONFIG = 'russian'
+
+
+def search_products(query, queryset=None):
+    """
+    Товары по поисковой строке, отсортированные по релевантности (аннотация ``rank``).
+
+    На PostgreSQL ищет по Product.search_vector (GIN-индекс, вектор поддерживает триггер):
+    название весит больше описания, строка разбирается как в поисковиках - "фраза", -исключение, or.
+    На других базах (SQLite в тестах) - простой icontains по названию и описанию.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    query = (query or '').strip()
+    if not query:
+        return queryset.none()
+
+    if connections[queryset.db].vendor == 'postgresql':
+        search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+        return (queryset.filter(search_vector=search_query)
+                .annotate(rank=SearchRank(F('search_vector'), search_query))
+                .order_by('-rank', '-pk'))
+
+    return (queryset.filter(Q(name__icontains=query) | Q(description__icontains=query))
+            .annotate(rank=Case(When(name__icontains=query, then=Value(1.0)), default=Value(0.5),
+                                output_field=FloatField()))
+            .order_by('-rank', '-pk'))
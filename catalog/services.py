@@ -1,74 +1,60 @@
-from apscheduler.triggers.cron import CronTrigger
-from django.core.mail import send_mail
-from django.conf import settings
-from django.core.cache import cache
-from .models import Category
-from .models import MailingSettings
+import logging
 
+from django.db import transaction
+from django.utils import timezone
 
-def add_jobs(scheduler):
-    for mailing_setting in MailingSettings.objects.filter(status='running'):
-        add_job(scheduler, mailing_setting)
+from .cache import category_cache
+from .delivery import MailDelivery, EmailLogWriter
+from .models import Product, Version
 
+logger = logging.getLogger(__name__)
 
-def add_job(scheduler, mailing_setting):
-    # задать вопрос про интервал и как использовать уже имеющиеся настройки рассылки в часах, днях и т.д.
-    for mailing_setting in MailingSettings.objects.filter(status='running'):
-        hours, minutes = mailing_setting.start_time.hour, mailing_setting.start_time.minute
-        if mailing_setting.frequency == 'daily':
-            trigger_time = CronTrigger(day="*", hour=hours, minute=minutes)
-            scheduler.add_job(
-                sending_mail,
-                trigger=trigger_time,
-                id=str(mailing_setting.pk),
-                max_instances=1,
-                replace_existing=True,
-                args=(mailing_setting,)
-            )
-        elif mailing_setting.frequency == 'weekly':
-            trigger_time = CronTrigger(day_of_week='mon', hour=hours, minute=minutes)
-            scheduler.add_job(
-                sending_mail,
-                trigger=trigger_time,
-                id=str(mailing_setting.pk),
-                max_instances=1,
-                replace_existing=True,
-                args=(mailing_setting,)
-            )
-        elif mailing_setting.frequency == 'monthly':
-            trigger_time = CronTrigger(day='1', hour=hours, minute=minutes)
-            scheduler.add_job(
-                sending_mail,
-                trigger=trigger_time,
-                id=str(mailing_setting.pk),
-                max_instances=1,
-                replace_existing=True,
-                args=(mailing_setting,)
-            )
 
+def sending_mail(mailing_setting, on_batch=None, sent_since=None):
+    # Каждому клиенту отдельное письмо, пачками через общее SMTP-соединение
+    log_writer = EmailLogWriter(mailing_setting)
 
-def sending_mail(mailing_setting):
-    clients = mailing_setting.client.all()
-    email_list = [client.email for client in clients]
-    message = mailing_setting.message
-    send_mail(
-        subject=message.subject,
-        message=message.message_content,
-        from_email=settings.EMAIL_HOST_USER,
-        recipient_list=email_list,
-        fail_silently=False,
-    )
+    def batch_done():
+        # журнал пишется после каждой пачки: по нему повторный запуск пропустит уже получивших письмо
+        log_writer.flush()
+        if on_batch is not None:
+            on_batch()
 
+    try:
+        result = MailDelivery(on_result=log_writer, on_batch=batch_done).send_mailing(mailing_setting, sent_since)
+    finally:
+        log_writer.flush()
+    logger.info('Рассылка %s: %s', mailing_setting.pk, result)
+    return result
 
-def get_categories():
-    # Пытаемся получить категории из кеша
-    categories = cache.get('categories')
-
-    if categories is None:
-        # Если категории не найдены в кеше, делаем выборку из базы данных
-        categories = Category.objects.all()
 
-        # Сохраняем результаты в кеше на определенный период времени
-        cache.set('categories', categories, 60 * 15)
-
-    return categories
+def get_categories():
+    # Список (id, name) из двухуровневого кеша, сбрасывается сигналами при изменении категорий
+    return category_cache.get()
+
+
+def touch_category_products(category_ids):
+    """
+    Название категории выводится на странице и в карточке товара: новая дата изменения
+    меняет их ETag и ключи кеша так же, как при изменении самого товара.
+    """
+    return Product.objects.filter(category_id__in=category_ids).update(last_change_date=timezone.now())
+
+
+def save_version(version):
+    """
+    Сохраняет версию товара одной транзакцией. Если версия текущая, остальные версии товара
+    снимаются одним UPDATE, и она становится активной версией товара. Строка товара блокируется
+    (SELECT ... FOR UPDATE), поэтому одновременные переключения выполняются по очереди,
+    а частичный уникальный индекс гарантирует не больше одной текущей версии.
+    Бросает Product.DoesNotExist, если товара нет.
+    """
+    with transaction.atomic():
+        Product.objects.select_for_update().only('pk').get(pk=version.product_id)
+        if version.is_current:
+            Version.objects.filter(product_id=version.product_id, is_current=True).exclude(
+                pk=version.pk).update(is_current=False)
+        version.save()
+        if version.is_current:
+            Product.objects.filter(pk=version.product_id).update(active_version=version)
+    return version
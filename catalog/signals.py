@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from catalog.cache import category_cache, product_detail_cache, product_facet_cache
+from catalog.models import (Category, MailingSettings, MailingChange, ForbiddenWord, Product, BlogPost, Version,
+                            ThumbnailQueue)
+from catalog.moderation import forbidden_words
+from catalog.services import touch_category_products
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_categories(sender, **kwargs):
+    # Сбрасываем после коммита, иначе другой процесс может закешировать старые данные под новым поколением
+    transaction.on_commit(category_cache.invalidate)
+    # названия категорий входят в счетчики фасетов
+    transaction.on_commit(product_facet_cache.invalidate)
+
+
+@receiver(post_save, sender=Category)
+def touch_products_on_category_change(sender, instance, created, update_fields, **kwargs):
+    # Товары трогаем, только если изменилось название: другие поля категории в карточке не выводятся
+    if created or (update_fields is not None and 'name' not in update_fields):
+        return
+    if getattr(instance, '_loaded_name', None) == instance.name:
+        return
+    touch_category_products([instance.pk])
+    instance._loaded_name = instance.name
+
+
+@receiver([post_save, post_delete], sender=MailingSettings)
+def enqueue_mailing_change(sender, instance, **kwargs):
+    # Планировщик забирает изменения из очереди и перерегистрирует только эту рассылку
+    MailingChange.objects.create(mailing_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ForbiddenWord)
+def reload_forbidden_words(sender, **kwargs):
+    transaction.on_commit(forbidden_words.invalidate)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=BlogPost)
+def create_preview_thumbnails(sender, instance, **kwargs):
+    # Миниатюры создает планировщик (или команда generate_thumbnails --queued), а не запрос:
+    # здесь превью только ставится в очередь, повторное сохранение ее не дублирует
+    if instance.preview:
+        ThumbnailQueue.objects.get_or_create(name=instance.preview.name)
+
+
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_product_detail(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: product_detail_cache.invalidate(pk))
+    transaction.on_commit(product_facet_cache.invalidate)
+
+
+@receiver([post_save, post_delete], sender=Version)
+def touch_product_on_version_change(sender, instance, **kwargs):
+    # Новая дата изменения меняет ETag страницы товара и ключ его карточки в списках
+    Product.objects.filter(pk=instance.product_id).update(last_change_date=timezone.now())
+    product_id = instance.product_id
+    transaction.on_commit(lambda: product_detail_cache.invalidate(product_id))
+    transaction.on_commit(product_facet_cache.invalidate)
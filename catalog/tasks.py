@@ -0,0 +1,109 @@
+import logging
+import os
+import socket
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction, close_old_connections
+from django.utils import timezone
+
+from catalog.models import MailingSettings, MailingTask
+from catalog.services import sending_mail
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue_mailing(mailing_id):
+    """Ставит рассылку в очередь, если по ней еще нет невыполненной задачи."""
+    if MailingTask.objects.filter(mailing_id=mailing_id, status__in=['queued', 'running']).exists():
+        return None
+    return MailingTask.objects.create(mailing_id=mailing_id)
+
+
+def claim_task():
+    """
+    Забирает самую старую задачу из очереди. SELECT ... FOR UPDATE SKIP LOCKED позволяет
+    нескольким воркерам разбирать очередь одновременно, не блокируя друг друга.
+    """
+    with transaction.atomic():
+        task = (MailingTask.objects.select_for_update(skip_locked=True)
+                .filter(status='queued').order_by('pk').first())
+        if task is None:
+            return None
+        task.status = 'running'
+        task.attempts += 1
+        task.worker = worker_name()
+        task.started_at = task.heartbeat_at = timezone.now()
+        task.save(update_fields=['status', 'attempts', 'worker', 'started_at', 'heartbeat_at'])
+    return task
+
+
+def heartbeat(task):
+    """Отмечает, что воркер еще выполняет задачу, иначе requeue_stale_tasks вернет ее в очередь."""
+    MailingTask.objects.filter(pk=task.pk, status='running', worker=task.worker).update(
+        heartbeat_at=timezone.now())
+
+
+def run_task(task):
+    try:
+        mailing_setting = MailingSettings.objects.select_related('message').get(pk=task.mailing_id)
+        # повторная попытка продолжает рассылку: получившие письмо в прошлых попытках пропускаются
+        sent_since = task.created_at if task.attempts > 1 else None
+        sending_mail(mailing_setting, on_batch=lambda: heartbeat(task), sent_since=sent_since)
+    except Exception as error:
+        logger.exception('Задача рассылки %s завершилась с ошибкой', task.pk)
+        # повторяем, пока не исчерпаны попытки
+        task.status = 'queued' if task.attempts < settings.MAILING_TASK_MAX_ATTEMPTS else 'failed'
+        task.error = str(error)
+    else:
+        task.status = 'done'
+        task.error = None
+    task.finished_at = timezone.now()
+    task.save(update_fields=['status', 'error', 'finished_at'])
+
+
+def requeue_stale_tasks():
+    """
+    Возвращает в очередь задачи упавших воркеров: те, по которым дольше таймаута не было отметки.
+    Длинная рассылка отмечается после каждой пачки и в очередь повторно не попадает.
+    """
+    deadline = timezone.now() - timedelta(seconds=settings.MAILING_TASK_TIMEOUT)
+    stale = MailingTask.objects.filter(status='running', heartbeat_at__lt=deadline)
+    failed = stale.filter(attempts__gte=settings.MAILING_TASK_MAX_ATTEMPTS).update(
+        status='failed', error='Превышено время выполнения', finished_at=timezone.now())
+    requeued = stale.update(status='queued')
+    return requeued, failed
+
+
+def worker_loop(poll_interval=None):
+    """
+    Цикл воркера: забирает и выполняет задачи, пока очередь не пуста, иначе ждет.
+    Ошибка базы или SMTP не останавливает воркер: итерация повторяется с растущей задержкой.
+    """
+    poll_interval = poll_interval or settings.MAILING_WORKER_POLL_INTERVAL
+    failures = 0
+    while True:
+        try:
+            close_old_connections()
+            task = claim_task()
+            if task is None:
+                requeue_stale_tasks()
+            else:
+                run_task(task)
+        except Exception:
+            failures += 1
+            delay = min(poll_interval * 2 ** failures, settings.MAILING_WORKER_MAX_BACKOFF)
+            logger.exception('Ошибка воркера рассылок, повтор через %s с', delay)
+            # после ошибки соединение с базой могло оборваться, следующая итерация откроет новое
+            connections.close_all()
+            time.sleep(delay)
+            continue
+
+        failures = 0
+        if task is None:
+            time.sleep(poll_interval)
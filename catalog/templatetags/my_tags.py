@@ -1,4 +1,8 @@
 from django import template
+from django.utils.safestring import mark_safe
+
+from catalog.cache import product_card_cache, product_detail_cache
+from catalog.thumbnails import thumbnail_url
 
 register = template.Library()
 
@@ -17,3 +21,24 @@ def mymedia_filter(val):
         return f'/media/{val}'
 
     return '#'
+
+
+@register.filter(name='thumbnail')
+def thumbnail_filter(val, size):
+    """Миниатюра превью заданного размера, например {{ product.preview|thumbnail:"200x200" }}"""
+    if val:
+        return thumbnail_url(str(val), size)
+
+    return '#'
+
+
+@register.simple_tag
+def product_cards(products):
+    # Карточки товаров из кеша фрагментов, рендерятся только изменившиеся
+    return mark_safe(''.join(product_card_cache.render_many(list(products))))
+
+
+@register.simple_tag
+def product_detail(product):
+    # Общая для всех пользователей часть страницы товара из кеша
+    return mark_safe(product_detail_cache.render(product))
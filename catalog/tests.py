@@ -1,3 +1,740 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from apscheduler.jobstores.memory import MemoryJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+from PIL import Image
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from catalog.cache import CategoryCache
+from catalog.counters import ViewCounter
+from catalog.delivery import MailDelivery, RateLimiter
+from catalog.exporters import export_products
+from catalog.importers import ProductImporter
+from catalog.moderation import ForbiddenWordMatcher, build_pattern
+from catalog.models import BlogPost, Category, ForbiddenWord, Product, Version, Client, EmailLog, MailingChange, \
+    MailingMessage, MailingSettings, MailingTask, ThumbnailQueue
+from catalog.paginators import KeysetPaginator
+from catalog.scheduler import apply_changes, job_id, sync_jobs
+from catalog.services import save_version
+from catalog.thumbnails import generate_queued_thumbnails, thumbnail_name, thumbnail_url
+from catalog.tasks import claim_task, enqueue_mailing, requeue_stale_tasks, run_task, worker_loop
+from catalog.views import MailingSettingsListView
+from users.models import User
+
+
+class ProductListingQueriesTestCase(TestCase):
+    """Количество запросов на страницу списка не должно зависеть от числа карточек."""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        for i in range(7):
+            product = Product.objects.create(name=f'Товар {i}', price=100 + i, category=cls.category, user=user)
+            version = Version.objects.create(product=product, version_number=f'1.{i}', version_name='Версия',
+                                             is_current=True)
+            product.active_version = version
+            product.save()
+
+    def test_home_queries(self):
+        # валидатор условного GET + выборка товаров
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('catalog:home'))
+        self.assertEqual(len(response.context['latest_products']), 5)
+
+    def test_products_queries(self):
+        # фасеты (заодно COUNT для пагинатора и валидатор условного GET) + выборка страницы
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('catalog:products'))
+        # по умолчанию сначала новые
+        self.assertContains(response, 'Активная версия: 1.6')
+
+    def test_category_products_queries(self):
+        # категория + фасеты + выборка страницы
+        with self.assertNumQueries(3):
+            self.client.get(reverse('catalog:category_products', args=[self.category.pk]))
+
+
+class ProductFilterTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        cls.toys = Category.objects.create(name='Игрушки')
+        cls.books = Category.objects.create(name='Книги')
+        for i, (category, price, is_published) in enumerate([
+            (cls.toys, 100, True), (cls.toys, 200, False), (cls.books, 300, True), (cls.books, 400, True),
+        ]):
+            Product.objects.create(name=f'Товар {i}', price=price, category=category, user=user,
+                                   is_published=is_published)
+
+    def test_filter_and_sort(self):
+        response = self.client.get(reverse('catalog:products'),
+                                   {'category': self.books.pk, 'price_min': 350, 'sort': '-price'})
+        self.assertEqual([product.price for product in response.context['products']], [400])
+
+        response = self.client.get(reverse('catalog:products'), {'sort': 'price', 'price_min': 'abc'})
+        self.assertEqual([product.price for product in response.context['products']], [100, 200, 300, 400])
+
+    def test_facet_counts(self):
+        response = self.client.get(reverse('catalog:products'), {'category': self.toys.pk, 'published': '1'})
+        facets = response.context['facets']
+        self.assertEqual(facets['total'], 1)
+        # счетчик фасета не учитывает собственный фильтр
+        self.assertEqual({item['name']: item['count'] for item in facets['categories']}, {'Игрушки': 1, 'Книги': 2})
+        self.assertEqual(facets['published'], {'yes': 1, 'no': 1})
+        self.assertEqual(facets['has_version'], {'yes': 0, 'no': 1})
+
+    @mock.patch('catalog.cache.is_shared_cache', return_value=True)
+    def test_facets_are_cached_until_products_change(self, shared):
+        cache.clear()
+        url = reverse('catalog:products')
+        with self.assertNumQueries(2):
+            self.client.get(url, {'category': self.toys.pk})
+        # повторный запрос с теми же фильтрами берет фасеты из кеша
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'category': self.toys.pk, 'sort': 'price'})
+        self.assertEqual(response.context['facets']['total'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.create(name='Новый', price=500, category=self.toys, user=User.objects.first())
+        response = self.client.get(url, {'category': self.toys.pk})
+        self.assertEqual(response.context['facets']['total'], 3)
+
+
+class MailingViewsQueriesTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        message = MailingMessage.objects.create(subject='Тема', message_content='Текст')
+        clients = Client.objects.bulk_create(
+            Client(full_name=f'Клиент {i}', email=f'client{i}@example.com') for i in range(60))
+        cls.mailings = []
+        for i in range(3):
+            mailing = MailingSettings.objects.create(start_time='2023-09-10T07:00:00Z', end_time='2023-09-20T07:00:00Z',
+                                                     message=message)
+            mailing.client.set(clients)
+            cls.mailings.append(mailing)
+
+    def test_mailing_list_queries(self):
+        # COUNT для пагинатора + рассылки с сообщением и числом клиентов + превью клиентов
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('catalog:mailing_list'))
+        mailing = response.context['mailing_clients'][0]
+        self.assertEqual(mailing.client_count, 60)
+        self.assertEqual(len(mailing.client_preview), MailingSettingsListView.client_preview_size)
+
+    def test_mailing_details_paginates_clients(self):
+        # рассылка с числом клиентов + страница клиентов
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('catalog:mailing_details', args=[self.mailings[0].pk]), {'page': 2})
+        self.assertEqual(len(response.context['clients']), 10)
+
+
+class ProductDetailsCachingTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(name='Товар', price=100, category=cls.category, user=cls.user)
+
+    def test_conditional_get(self):
+        url = reverse('catalog:product_details', args=[self.product.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_varies_on_auth(self):
+        url = reverse('catalog:product_details', args=[self.product.pk])
+        anonymous_etag = self.client.get(url)['ETag']
+        self.client.force_login(self.user)
+        self.assertNotEqual(self.client.get(url)['ETag'], anonymous_etag)
+
+    def test_edit_invalidates_page(self):
+        url = reverse('catalog:product_details', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = 250
+            self.product.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Цена: 250')
+
+    def test_version_change_invalidates_page(self):
+        url = reverse('catalog:product_details', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Version.objects.create(product=self.product, version_number='2', version_name='Вторая')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_category_rename_invalidates_page(self):
+        url = reverse('catalog:product_details', args=[self.product.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Новое название'
+            self.category.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Новое название')
+
+
+class ListingConditionalGetTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@example.com', password='password')
+        cls.category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(name='Товар', price=100, category=cls.category, user=cls.user)
+
+    def test_not_modified(self):
+        for url in [reverse('catalog:home'), reverse('catalog:products') + '?sort=price',
+                    reverse('catalog:category_products', args=[self.category.pk]), reverse('catalog:blogpost_list')]:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('s-maxage', response['Cache-Control'])
+            with self.assertNumQueries(1 if 'category' not in url else 2):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_product_change_updates_etag(self):
+        url = reverse('catalog:products')
+        etag = self.client.get(url)['ETag']
+        self.product.price = 200
+        self.product.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_authenticated_pages_are_private(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('catalog:products'))
+        self.assertIn('private', response['Cache-Control'])
+
+
+class VersionActivationTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+        cls.product = Product.objects.create(name='Товар', price=100, category=category, user=cls.user)
+
+    def create_version(self, number, is_current=True):
+        return self.client.post(reverse('catalog:create_version', args=[self.product.pk]), {
+            'version_number': number, 'version_name': 'Версия', 'is_current': is_current,
+        })
+
+    def test_switches_current_version(self):
+        self.client.force_login(self.user)
+        self.assertRedirects(self.create_version('1'), reverse('catalog:products'), fetch_redirect_response=False)
+        self.create_version('2')
+        self.create_version('3', is_current=False)
+
+        current = Version.objects.get(product=self.product, is_current=True)
+        self.assertEqual(current.version_number, '2')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.active_version, current)
+
+    def test_unknown_product(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('catalog:create_version', args=[0]), {
+            'version_number': '1', 'version_name': 'Версия', 'is_current': True})
+        self.assertEqual(response.status_code, 404)
+
+    def test_one_current_version_per_product(self):
+        Version.objects.create(product=self.product, version_number='1', version_name='Версия', is_current=True)
+        with self.assertRaises(IntegrityError):
+            Version.objects.create(product=self.product, version_number='2', version_name='Версия', is_current=True)
+
+
+class KeysetPaginatorTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Категория')
+        for i in range(12):
+            Product.objects.create(name=f'Товар {i}', price=100, category=category, user=user)
+        # как после импорта: у всей пачки одна и та же отметка времени с микросекундами
+        now = datetime.datetime(2024, 1, 1, 12, 0, 0, 123456, tzinfo=datetime.timezone.utc)
+        Product.objects.update(last_change_date=now)
+        cls.expected = list(Product.objects.order_by('-last_change_date', 'id').values_list('pk', flat=True))
+
+    def test_pages_with_shared_timestamp(self):
+        paginator = KeysetPaginator(Product.objects.all(), 5, ordering=('-last_change_date', 'id'))
+        pages, page = [], paginator.page()
+        while True:
+            pages.append([product.pk for product in page])
+            if not page.has_next():
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual(pages, [self.expected[:5], self.expected[5:10], self.expected[10:]])
+
+        # обратно до первой страницы
+        backward = []
+        while page.has_previous():
+            page = paginator.page(page.previous_cursor)
+            backward.append([product.pk for product in page])
+        self.assertEqual(backward, [self.expected[5:10], self.expected[:5]])
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), 5, ordering=('-last_change_date', 'id'))
+        page = paginator.get_page('not-a-cursor')
+        self.assertEqual([product.pk for product in page], self.expected[:5])
+        self.assertFalse(page.has_previous())
+
+
+class MailDeliveryTestCase(SimpleTestCase):
+
+    def test_worker_errors_are_raised(self):
+        def on_result(recipient, error):
+            if recipient[0] == 3:
+                raise RuntimeError('журнал недоступен')
+
+        delivery = MailDelivery(batch_size=2, concurrency=2, rate_limit=0, on_result=on_result,
+                                backend='django.core.mail.backends.locmem.EmailBackend')
+        recipients = [(i, f'client{i}@example.com') for i in range(6)]
+        with self.assertRaisesMessage(RuntimeError, 'журнал недоступен'):
+            delivery.send(recipients, 'Тема', 'Текст', 'shop@example.com')
+
+
+class AsyncSMTPBackendTestCase(SimpleTestCase):
+
+    def test_connections_are_reused_across_batches(self):
+        connects = []
+
+        class FakeSMTP:
+            def __init__(self):
+                self.sent = []
+                connects.append(self)
+
+            async def send_message(self, message, sender, recipients):
+                # отдаем управление, как настоящий сокет, чтобы сессии пула работали одновременно
+                await asyncio.sleep(0)
+                self.sent.extend(recipients)
+
+            async def quit(self):
+                pass
+
+        async def connect(backend):
+            return FakeSMTP()
+
+        results = []
+        delivery = MailDelivery(batch_size=3, rate_limit=0, on_result=lambda recipient, error: results.append(error),
+                                backend='catalog.email_backends.AsyncSMTPEmailBackend')
+        recipients = [(i, f'client{i}@example.com') for i in range(12)]
+        with override_settings(EMAIL_ASYNC_POOL_SIZE=2), \
+                mock.patch('catalog.email_backends.AsyncSMTPEmailBackend._connect', connect):
+            result = delivery.send(recipients, 'Тема', 'Текст', 'shop@example.com')
+
+        self.assertEqual((result.sent, result.failed), (12, 0))
+        # четыре пачки прошли через два соединения пула, а не открывали новые
+        self.assertEqual(len(connects), 2)
+        self.assertEqual(sum(len(smtp.sent) for smtp in connects), 12)
+
+
+class RateLimiterTestCase(SimpleTestCase):
+
+    @mock.patch('catalog.delivery.time')
+    def test_batch_reserves_all_messages(self, time):
+        time.monotonic.return_value = 100
+        limiter = RateLimiter(rate=10)
+        limiter.wait(50)
+        time.sleep.assert_not_called()
+        # пачка из 50 писем при 10 письмах в секунду занимает 5 секунд
+        limiter.wait(50)
+        time.sleep.assert_called_once_with(5)
+
+
+class MailingTaskTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        message = MailingMessage.objects.create(subject='Тема', message_content='Текст')
+        cls.mailing = MailingSettings.objects.create(start_time='2023-09-10T07:00:00Z',
+                                                     end_time='2023-09-20T07:00:00Z', message=message)
+        cls.mailing.client.set(Client.objects.bulk_create(
+            Client(full_name=f'Клиент {i}', email=f'client{i}@example.com') for i in range(3)))
+
+    def test_claim_and_requeue_by_heartbeat(self):
+        self.assertIsNotNone(enqueue_mailing(self.mailing.pk))
+        self.assertIsNone(enqueue_mailing(self.mailing.pk))
+        task = claim_task()
+        self.assertEqual((task.status, task.attempts), ('running', 1))
+        self.assertIsNone(claim_task())
+
+        # задача идет давно, но воркер отмечается - ее не трогаем
+        long_ago = timezone.now() - datetime.timedelta(hours=2)
+        MailingTask.objects.filter(pk=task.pk).update(started_at=long_ago)
+        self.assertEqual(requeue_stale_tasks(), (0, 0))
+
+        MailingTask.objects.filter(pk=task.pk).update(heartbeat_at=long_ago)
+        self.assertEqual(requeue_stale_tasks(), (1, 0))
+        self.assertEqual(claim_task().pk, task.pk)
+
+    @override_settings(MAILING_BATCH_SIZE=1)
+    def test_run_task_heartbeats_every_batch(self):
+        enqueue_mailing(self.mailing.pk)
+        task = claim_task()
+        with mock.patch('catalog.tasks.heartbeat') as heartbeat:
+            run_task(task)
+        self.assertEqual(heartbeat.call_count, 3)
+        self.assertEqual(len(mail.outbox), 3)
+        task.refresh_from_db()
+        self.assertEqual(task.status, 'done')
+
+    def test_retry_skips_delivered_recipients(self):
+        enqueue_mailing(self.mailing.pk)
+        task = claim_task()
+        clients = list(self.mailing.client.order_by('pk'))
+        # прошлый запуск рассылки до постановки задачи не учитывается
+        old = EmailLog.objects.create(client=clients[2], settings=self.mailing, status='STATUS_OK')
+        EmailLog.objects.filter(pk=old.pk).update(datetime_attempt=task.created_at - datetime.timedelta(days=1))
+        EmailLog.objects.create(client=clients[0], settings=self.mailing, status='STATUS_OK')
+        EmailLog.objects.create(client=clients[1], settings=self.mailing, status='STATUS_FAILED')
+        EmailLog.objects.create(client=None, settings=self.mailing, status='STATUS_OK')
+
+        MailingTask.objects.filter(pk=task.pk).update(status='queued')
+        task = claim_task()
+        self.assertEqual(task.attempts, 2)
+        run_task(task)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [clients[1].email, clients[2].email])
+
+    @override_settings(MAILING_WORKER_MAX_BACKOFF=5)
+    @mock.patch('catalog.tasks.connections')
+    @mock.patch('catalog.tasks.time.sleep', side_effect=[None, None, None, KeyboardInterrupt])
+    @mock.patch('catalog.tasks.claim_task', side_effect=[OperationalError('down'), OperationalError('down'),
+                                                         OperationalError('down'), None])
+    def test_worker_survives_errors(self, claim, sleep, connections):
+        with self.assertRaises(KeyboardInterrupt), self.assertLogs('catalog.tasks', 'ERROR'):
+            worker_loop(poll_interval=2)
+        # пауза растет после каждой ошибки подряд, но не больше MAILING_WORKER_MAX_BACKOFF
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [4, 5, 5, 2])
+
+
+class ViewCounterTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.post = BlogPost.objects.create(title='Запись', content='Текст')
+
+    def views_count(self):
+        return BlogPost.objects.get(pk=self.post.pk).views_count
+
+    @mock.patch.object(ViewCounter, 'shared', True)
+    def test_flush_on_threshold(self):
+        counter = ViewCounter(threshold=3, interval=3600)
+        self.assertEqual([counter.increment(self.post.pk) for _ in range(2)], [1, 2])
+        self.assertEqual(self.views_count(), 0)
+
+        # третий просмотр достигает порога и переносит все в базу
+        counter.increment(self.post.pk)
+        self.assertEqual(self.views_count(), 3)
+        self.assertEqual(counter.pending(self.post.pk), 0)
+
+        counter.increment(self.post.pk)
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(self.views_count(), 4)
+
+    @mock.patch.object(ViewCounter, 'shared', True)
+    def test_flush_survives_evicted_key(self):
+        counter = ViewCounter(threshold=100, interval=3600)
+        counter.increment(self.post.pk)
+        with mock.patch('catalog.counters.cache.decr', side_effect=ValueError('evicted')):
+            self.assertEqual(counter.flush(), 1)
+        self.assertEqual(self.views_count(), 1)
+
+    @mock.patch.object(ViewCounter, 'shared', True)
+    def test_flush_error_does_not_break_increment(self):
+        counter = ViewCounter(threshold=1, interval=3600)
+        with mock.patch.object(ViewCounter, 'flush', side_effect=OperationalError('down')), \
+                self.assertLogs('catalog.counters', 'ERROR'):
+            self.assertEqual(counter.increment(self.post.pk), 1)
+
+    def test_process_local_cache_writes_immediately(self):
+        counter = ViewCounter(threshold=100, interval=3600)
+        self.assertFalse(counter.shared)
+        counter.increment(self.post.pk)
+        counter.increment(self.post.pk)
+        self.assertEqual(self.views_count(), 2)
+        self.assertEqual(counter.flush(), 0)
+
+
+class ProductImporterTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_user(email='owner@example.com', password='password')
+        Category.objects.create(name='Книги')
+
+    def test_invalid_rows_are_skipped(self):
+        rows = [
+            {'name': 'Книга', 'price': '199.90', 'category': 'Книги'},
+            {'name': 'Бесконечная', 'price': 'Infinity', 'category': 'Книги'},
+            {'name': 'Дорогая', 'price': '1000000000', 'category': 'Книги'},
+            {'name': 'Длинное превью', 'price': '1', 'category': 'Книги', 'preview': 'p' * 200},
+            {'name': 'Игрушка', 'price': '10', 'category': 'Игрушки'},
+            {'name': 'Игрушка', 'price': '10', 'category': 'Игрушки', 'user': 'nobody@example.com'},
+            {'name': 'Журнал', 'price': 50, 'category': 'Книги', 'is_published': 'true'},
+        ]
+        importer = ProductImporter(batch_size=3, default_user='owner@example.com')
+        imported, errors, _ = importer.run(iter(rows))
+        self.assertEqual((imported, errors), (2, 5))
+        self.assertEqual(sorted(Product.objects.values_list('name', 'is_published')),
+                         [('Журнал', True), ('Книга', False)])
+
+    def test_creates_categories(self):
+        importer = ProductImporter(default_user='owner@example.com', create_categories=True)
+        importer.run([{'name': 'Игрушка', 'price': '10', 'category': 'Игрушки'}])
+        self.assertEqual(Product.objects.get().category.name, 'Игрушки')
+
+
+class ForbiddenWordMatcherTestCase(TestCase):
+
+    def test_build_pattern(self):
+        regex = re.compile(build_pattern(['крипта', 'криптовалюта', 'казино', 'ставки+']))
+        self.assertEqual(regex.pattern, '(?:к(?:азино|рипт(?:а|овалюта))|ставки\\+)')
+        self.assertEqual(regex.search('новая криптовалюта').group(), 'криптовалюта')
+        self.assertEqual(regex.search('ставки+ онлайн').group(), 'ставки+')
+        self.assertIsNone(regex.search('крипто'))
+
+    def test_reloads_words_from_database(self):
+        ForbiddenWord.objects.all().delete()
+        matcher = ForbiddenWordMatcher(path='', check_interval=0)
+        self.assertIsNone(matcher.search('Дешевый радар'))
+
+        # запись из другого процесса: сигнала здесь нет, кеш не общий
+        ForbiddenWord.objects.bulk_create([ForbiddenWord(word='радар')])
+        self.assertEqual(matcher.search('Дешевый РАДАР'), 'радар')
+        ForbiddenWord.objects.all().delete()
+        self.assertIsNone(matcher.search('Дешевый радар'))
+
+
+class CategoryCacheTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Книги')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_levels_and_invalidation(self):
+        categories = CategoryCache(l1_ttl=60)
+        with self.assertNumQueries(1):
+            self.assertEqual(categories.get(), [(self.category.pk, 'Книги')])
+        with self.assertNumQueries(0):
+            categories.get()
+
+        # другой процесс с пустым локальным уровнем читает общий кеш
+        with self.assertNumQueries(0):
+            CategoryCache(l1_ttl=60).get()
+
+        toys = Category.objects.create(name='Игрушки')
+        categories.invalidate()
+        self.assertEqual(categories.get(), [(self.category.pk, 'Книги'), (toys.pk, 'Игрушки')])
+        self.assertEqual(categories.get_stats(), {'l1_hits': 1, 'l2_hits': 0, 'misses': 2, 'invalidations': 1})
+
+
+class MailingSchedulerTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.daily = MailingSettings.objects.create(start_time=now, end_time=now + datetime.timedelta(days=30),
+                                                   frequency='daily', status='running')
+        cls.weekly = MailingSettings.objects.create(start_time=now, end_time=now + datetime.timedelta(days=30),
+                                                    frequency='weekly', status='running')
+        cls.finished = MailingSettings.objects.create(start_time=now - datetime.timedelta(days=30),
+                                                      end_time=now - datetime.timedelta(days=1), status='running')
+        cls.created = MailingSettings.objects.create(start_time=now, end_time=now + datetime.timedelta(days=30))
+
+    def setUp(self):
+        self.scheduler = BackgroundScheduler(jobstores={'default': MemoryJobStore()})
+        self.scheduler.start(paused=True)
+        self.addCleanup(self.scheduler.shutdown, wait=False)
+
+    def job_ids(self):
+        return {job.id for job in self.scheduler.get_jobs()}
+
+    def test_sync_jobs(self):
+        self.scheduler.add_job(print, 'interval', hours=1, id=job_id(0))
+        report = sync_jobs(self.scheduler)
+        self.assertEqual({key: report[key] for key in ('added', 'updated', 'unchanged', 'removed', 'completed')},
+                         {'added': 2, 'updated': 0, 'unchanged': 0, 'removed': 1, 'completed': 1})
+        self.assertEqual(self.job_ids(), {job_id(self.daily.pk), job_id(self.weekly.pk)})
+
+        # повторная синхронизация ничего не меняет
+        report = sync_jobs(self.scheduler)
+        self.assertEqual((report['added'], report['unchanged'], report['removed']), (0, 2, 0))
+
+    def test_apply_changes(self):
+        sync_jobs(self.scheduler)
+        MailingChange.objects.all().delete()
+
+        self.weekly.frequency = 'monthly'
+        self.weekly.save()
+        self.daily.status = 'completed'
+        self.daily.save()
+        self.created.status = 'running'
+        self.created.save()
+        # несколько изменений одной рассылки синхронизируются один раз
+        self.created.save()
+
+        # без декоратора close_old_connections: он закрыл бы соединение внутри транзакции теста
+        self.assertEqual(apply_changes.__wrapped__(self.scheduler), 3)
+        self.assertEqual(self.job_ids(), {job_id(self.weekly.pk), job_id(self.created.pk)})
+        trigger = self.scheduler.get_job(job_id(self.weekly.pk)).trigger
+        self.assertEqual({field.name: str(field) for field in trigger.fields}['day'], '1')
+        self.assertFalse(MailingChange.objects.exists())
+
+
+class FillCommandTestCase(TestCase):
+
+    def test_sync_categories(self):
+        Category.objects.create(name='Книги', description='Старое описание')
+        unchanged = Category.objects.create(name='Игрушки')
+        fixture = [
+            {'model': 'catalog.category', 'pk': 1, 'fields': {'name': 'Книги', 'description': 'Новое описание'}},
+            {'model': 'catalog.category', 'pk': 2, 'fields': {'name': 'Игрушки', 'description': None}},
+            {'model': 'catalog.category', 'pk': 3, 'fields': {'name': 'Журналы', 'description': None}},
+            {'model': 'catalog.product', 'pk': 1, 'fields': {'name': 'Товар'}},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as file:
+            json.dump(fixture, file)
+        self.addCleanup(os.remove, file.name)
+
+        call_command('fill', file.name, stdout=io.StringIO())
+        self.assertEqual(dict(Category.objects.values_list('name', 'description')),
+                         {'Книги': 'Новое описание', 'Игрушки': None, 'Журналы': None})
+        # существующие записи обновляются на месте, а не пересоздаются
+        self.assertTrue(Category.objects.filter(pk=unchanged.pk).exists())
+
+    def test_sync_touches_products_of_renamed_categories(self):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Книги', description='Раздел')
+        product = Product.objects.create(name='Товар', price=100, category=category, user=user)
+        Product.objects.update(last_change_date=timezone.now() - datetime.timedelta(days=1))
+        fixture = [{'model': 'catalog.category', 'pk': 1, 'fields': {'name': 'Новые книги', 'description': 'Раздел'}}]
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as file:
+            json.dump(fixture, file)
+        self.addCleanup(os.remove, file.name)
+
+        # по описанию, чтобы название обновилось на месте
+        with mock.patch.dict('catalog.importers.SYNC_NATURAL_KEYS', {'catalog.category': ('description',)}):
+            call_command('fill', file.name, stdout=io.StringIO())
+        product.refresh_from_db()
+        self.assertGreater(product.last_change_date, timezone.now() - datetime.timedelta(hours=1))
+
+
+class CategoryProductsTouchTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        cls.category = Category.objects.create(name='Книги')
+        Product.objects.create(name='Товар', price=100, category=cls.category, user=user)
+
+    def setUp(self):
+        self.yesterday = timezone.now() - datetime.timedelta(days=1)
+        Product.objects.update(last_change_date=self.yesterday)
+
+    def assertTouched(self, touched):
+        self.assertEqual(Product.objects.filter(last_change_date__gt=self.yesterday).exists(), touched)
+
+    def test_save_without_rename_keeps_products(self):
+        category = Category.objects.get(pk=self.category.pk)
+        category.description = 'Новое описание'
+        category.save()
+        category.save(update_fields=['description'])
+        self.assertTouched(False)
+
+    def test_rename_touches_products(self):
+        category = Category.objects.get(pk=self.category.pk)
+        category.name = 'Новые книги'
+        category.save()
+        self.assertTouched(True)
+
+
+class ProductExportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='owner@example.com', password='password')
+        category = Category.objects.create(name='Книги')
+        for i in range(3):
+            product = Product.objects.create(name=f'Товар {i}', price=100 + i, category=category, user=user)
+        save_version(Version(product=product, version_number='2.0', version_name='Вторая', is_current=True))
+
+    def test_csv(self):
+        lines = b''.join(export_products('csv', chunk_size=2)).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:5], ['id', 'name', 'description', 'price', 'category'])
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[3].endswith(',2.0,Вторая'))
+
+    def test_gzip_jsonl(self):
+        data = gzip.decompress(b''.join(export_products('jsonl', compress=True)))
+        rows = [json.loads(line) for line in data.decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Товар 0', 'Товар 1', 'Товар 2'])
+        self.assertEqual((rows[0]['category'], rows[0]['price'], rows[0]['version_number']), ('Книги', '100.00', None))
+
+
+class ThumbnailTestCase(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        overridden = override_settings(MEDIA_ROOT=media.name, THUMBNAIL_SIZES=['200x200'], THUMBNAIL_FORMAT='jpeg')
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+        cache.clear()
+
+    def create_post(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(buffer, 'JPEG')
+        return BlogPost.objects.create(title='Запись', content='Текст',
+                                       preview=SimpleUploadedFile('photo.jpg', buffer.getvalue()))
+
+    def test_name_keeps_original_extension(self):
+        self.assertEqual(thumbnail_name('previews/photo.jpg', '200x200', 'webp'), 'previews/photo.jpg.200x200.webp')
+        self.assertNotEqual(thumbnail_name('previews/photo.jpg', '200x200'),
+                            thumbnail_name('previews/photo.png', '200x200'))
+
+    def test_save_only_queues_preview(self):
+        post = self.create_post()
+        name = post.preview.name
+        self.assertTrue(ThumbnailQueue.objects.filter(name=name).exists())
+        # страница до обработки очереди показывает оригинал
+        self.assertTrue(thumbnail_url(name, '200x200').endswith('photo.jpg'))
+
+        self.assertEqual(generate_queued_thumbnails(), 1)
+        self.assertFalse(ThumbnailQueue.objects.exists())
+        self.assertTrue(thumbnail_url(name, '200x200').endswith('photo.jpg.200x200.jpeg'))
+
+    def test_url_checks_storage_once(self):
+        post = self.create_post()
+        with mock.patch('catalog.thumbnails.default_storage.exists', return_value=True) as exists:
+            for _ in range(3):
+                thumbnail_url(post.preview.name, '200x200')
+        exists.assert_called_once()
@@ -0,0 +1,104 @@
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from catalog.models import ThumbnailQueue
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def parse_size(size):
+    width, height = size.lower().split('x')
+    return int(width), int(height)
+
+
+def thumbnail_name(name, size, image_format=None):
+    """
+    Имя миниатюры рядом с оригиналом: previews/photo.jpg -> previews/photo.jpg.200x200.webp.
+    Расширение оригинала остается в имени, иначе у photo.jpg и photo.png была бы одна миниатюра.
+    """
+    image_format = image_format or settings.THUMBNAIL_FORMAT
+    return f'{name}.{size}.{image_format}'
+
+
+def thumbnail_cache_key(target):
+    return f'thumbnail_url:{hashlib.md5(target.encode()).hexdigest()}'
+
+
+def generate_thumbnail(name, size, image_format=None, force=False, storage=default_storage):
+    """
+    Создает миниатюру изображения ``name`` не больше ``size`` с сохранением пропорций.
+    Возвращает имя миниатюры или None, если оригинал не удалось прочитать.
+    """
+    image_format = image_format or settings.THUMBNAIL_FORMAT
+    target = thumbnail_name(name, size, image_format)
+    if not force and storage.exists(target):
+        return target
+
+    try:
+        with storage.open(name, 'rb') as file:
+            image = Image.open(file)
+            # учитываем поворот из EXIF, иначе фото с телефона окажется лежащим на боку
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(parse_size(size), Image.LANCZOS)
+    except (OSError, ValueError) as error:
+        logger.warning('Не удалось создать миниатюру %s: %s', name, error)
+        return None
+
+    if image_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, FORMATS[image_format], quality=settings.THUMBNAIL_QUALITY)
+
+    if storage.exists(target):
+        storage.delete(target)
+    storage.save(target, ContentFile(buffer.getvalue()))
+    # страницы сразу начнут показывать миниатюру вместо оригинала
+    cache.delete(thumbnail_cache_key(target))
+    return target
+
+
+def generate_thumbnails(name, force=False):
+    """Создает миниатюры всех размеров из THUMBNAIL_SIZES. Возвращает имена созданных файлов."""
+    thumbnails = [generate_thumbnail(name, size, force=force) for size in settings.THUMBNAIL_SIZES]
+    return [thumbnail for thumbnail in thumbnails if thumbnail]
+
+
+def generate_queued_thumbnails(batch_size=None):
+    """
+    Создает миниатюры для превью из очереди ThumbnailQueue и убирает их из очереди.
+    Возвращает число обработанных превью.
+    """
+    batch_size = batch_size or settings.THUMBNAIL_QUEUE_BATCH_SIZE
+    queued = list(ThumbnailQueue.objects.order_by('pk')[:batch_size])
+    for item in queued:
+        generate_thumbnails(item.name)
+    # новое превью хранилище сохраняет под новым именем, так что удаляются только обработанные записи
+    ThumbnailQueue.objects.filter(pk__in=[item.pk for item in queued]).delete()
+    return len(queued)
+
+
+def thumbnail_url(name, size):
+    """
+    URL миниатюры, а пока ее нет - URL оригинала.
+    Проверка наличия файла в хранилище кешируется, отсутствие - ненадолго, пока миниатюру создает планировщик.
+    """
+    target = thumbnail_name(name, size)
+    key = thumbnail_cache_key(target)
+    url = cache.get(key)
+    if url is None:
+        if default_storage.exists(target):
+            url = default_storage.url(target)
+            cache.set(key, url, settings.THUMBNAIL_URL_CACHE_TIMEOUT)
+        else:
+            url = default_storage.url(name)
+            cache.set(key, url, settings.THUMBNAIL_MISSING_CACHE_TIMEOUT)
+    return url
@@ -2,7 +2,8 @@ from django.urls import path
 from catalog.views import HomeView, ContactsView, ProductsView, CategoryProductsView, ProductDetailsView, \
     CreateProductView, BlogPostListView, BlogPostCreateView, BlogPostDetailView, BlogPostUpdateView, BlogPostDeleteView, \
     MailingSettingsCreateView, MailingSettingsListView, VersionCreateView, MailingSettingsUpdateView, \
-    MailingSettingsDeleteView, MailingSettingsDetailView, UpdateProductView
+    MailingSettingsDeleteView, MailingSettingsDetailView, UpdateProductView, ProductExportView, \
+    ProductSearchView
 
 app_name = 'catalog'
 
@@ -14,6 +15,8 @@ urlpatterns = [
     path('product/<int:pk>/', ProductDetailsView.as_view(), name='product_details'),
     path('products/create/', CreateProductView.as_view(), name='product_create'),
     path('products/edit/<int:pk>/', UpdateProductView.as_view(), name='product_edit'),
+    path('products/export/', ProductExportView.as_view(), name='product_export'),
+    path('search/', ProductSearchView.as_view(), name='product_search'),
 
     path('blog/', BlogPostListView.as_view(), name='blogpost_list'),
     path('blog/create/', BlogPostCreateView.as_view(), name='blogpost_create'),
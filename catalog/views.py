@@ -1,26 +1,80 @@
+import hashlib
+
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import PermissionDenied
-from django.core.paginator import Paginator, EmptyPage
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Prefetch
+from django.http import StreamingHttpResponse, Http404
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
-from django.views.decorators.cache import cache_page
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date, quote_etag, urlencode
+from django.views.decorators.http import condition
+from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
 from pytils.translit import slugify
 
 from catalog.models import Product, Contact, Category, BlogPost, Version, Client, MailingSettings, \
     EmailLog
 from catalog.forms import CreateProductForm, BlogPostForm, VersionForm, MailingSettingsCreateForm, CreateTestProductForm
+from catalog.cache import product_facet_cache
+from catalog.counters import view_counter
+from catalog.exporters import FORMATS as EXPORT_FORMATS, export_products
+from catalog.filters import ProductFilter
+from catalog.paginators import KeysetPaginator
+from catalog.search import search_products
+from catalog.services import save_version
+
+
+class ConditionalGetMixin:
+    """
+    Условный GET для списков: валидаторы страницы (дата последнего изменения и данные, от которых
+    зависит содержимое) считаются дешевым агрегатом до рендеринга, совпадение с If-None-Match
+    или If-Modified-Since возвращает 304. Гостям отдается Cache-Control для общего кеша (CDN,
+    обратный прокси), вошедшим пользователям - только для браузера с обязательной проверкой.
+    """
+    shared_max_age = settings.LISTING_CACHE_S_MAXAGE
+
+    def get_validators(self):
+        """Возвращает (last_modified, данные для ETag)."""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        last_modified, state = self.get_validators()
+        # меню страницы отличается для гостей и вошедших пользователей
+        audience = 'user' if request.user.is_authenticated else 'anon'
+        digest = hashlib.md5(repr((state, last_modified, audience)).encode()).hexdigest()
+        etag = quote_etag(f'{digest}-{audience}')
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        response.headers.setdefault('ETag', etag)
+        if timestamp is not None:
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=0, s_maxage=self.shared_max_age)
+        patch_vary_headers(response, ['Cookie'])
+        return response
 
 
-class HomeView(ListView):
+class HomeView(ConditionalGetMixin, ListView):
     model = Product
-    queryset = Product.objects.order_by('-id')[:5]
+    queryset = Product.objects.for_listing().order_by('-id')[:5]
     template_name = 'catalog/home.html'
     context_object_name = 'latest_products'
     extra_context = {'title': 'Наши последние товары'}
 
+    def get_validators(self):
+        state = Product.objects.aggregate(last_change=Max('last_change_date'), count=Count('pk'), last_id=Max('pk'))
+        return state['last_change'], state
+
 
 class ContactsView(ListView):
     model = Contact
@@ -38,62 +92,175 @@ class ContactsView(ListView):
         return redirect('contacts')
 
 
+def product_last_modified(request, pk):
+    # ETag и Last-Modified считаются из одного запроса last_change_date
+    if not hasattr(request, '_product_last_change'):
+        request._product_last_change = Product.objects.filter(pk=pk).values_list(
+            'last_change_date', flat=True).first()
+    return request._product_last_change
+
+
+def product_etag(request, pk):
+    last_change = product_last_modified(request, pk)
+    if last_change is None:
+        return None
+    # меню страницы отличается для гостей и вошедших пользователей
+    audience = 'user' if request.user.is_authenticated else 'anon'
+    return f'"product-{pk}-{last_change.timestamp()}-{audience}"'
+
+
+@method_decorator(condition(etag_func=product_etag, last_modified_func=product_last_modified), name='get')
 class ProductDetailsView(DetailView):
+    """
+    Страница товара. Общая часть кешируется фрагментом (catalog.cache.ProductDetailCache),
+    повторный запрос с If-None-Match/If-Modified-Since получает 304 без рендеринга.
+    """
     model = Product
     template_name = 'catalog/product_details.html'
     context_object_name = 'product'
-    if settings.CACHE_ENABLED:
-        @cache_page(60 * 15)  # Пример: кешировать результат на 15 минут
-        def get(self, request, *args, **kwargs):
-            return super().get(request, *args, **kwargs)
-
-
-class ProductsView(ListView):
-    model = Product
-    template_name = 'catalog/products.html'
-    context_object_name = 'products'
+    queryset = Product.objects.select_related('category')
+
+    def get(self, request, *args, **kwargs):
+        response = super().get(request, *args, **kwargs)
+        # браузер хранит страницу, но каждый раз сверяет ETag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Cookie'])
+        return response
+
+
+class ProductExportView(PermissionRequiredMixin, View):
+    """Потоковая выгрузка каталога: ?format=csv|jsonl, ?gzip=1 для сжатия."""
+    permission_required = 'catalog.view_product'
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            raise Http404('Неизвестный формат выгрузки')
+        compress = request.GET.get('gzip') == '1'
+
+        filename = f'products.{file_format}' + ('.gz' if compress else '')
+        content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_products(file_format, compress),
+                                         content_type='application/gzip' if compress else content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ProductPaginationMixin:
+    """Переключает список товаров между постраничной (OFFSET) и курсорной (keyset) пагинацией."""
+    paginate_by = 5
+    pagination_mode = settings.PRODUCTS_PAGINATION
+    keyset_ordering = settings.PRODUCTS_KEYSET_ORDERING
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def get_paginator_count(self):
+        """Число товаров, если оно уже известно, чтобы пагинатор не делал отдельный COUNT."""
+        return None
+
+    def paginate_queryset(self, queryset, page_size):
+        ordering = self.get_keyset_ordering()
+        if self.pagination_mode == 'keyset':
+            paginator = KeysetPaginator(queryset, page_size, ordering=ordering)
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        else:
+            paginator = self.get_paginator(queryset.order_by(*ordering), page_size)
+            count = self.get_paginator_count()
+            if count is not None:
+                paginator.count = count
+            # Если номер страницы недопустим, get_page возвращает последнюю страницу
+            page = paginator.get_page(self.request.GET.get('page'))
+        return paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context['pagination_mode'] = self.pagination_mode
+        return context
 
-        # Получение всех объектов модели Product
-        products = Product.objects.all()
 
-        # Создание экземпляра класса Paginator
-        paginator = Paginator(products, 5)  # Здесь 10 - количество объектов на странице
+class ProductFilterMixin(ConditionalGetMixin, ProductPaginationMixin):
+    """Фильтры, сортировка и счетчики фасетов для списков товаров, см. catalog.filters."""
 
-        # Получение номера запрошенной страницы из параметра запроса
-        page_number = self.request.GET.get('page')
+    def get_base_queryset(self):
+        return Product.objects.for_listing()
 
-        try:
-            # Получение объектов для указанной страницы
-            page_objects = paginator.get_page(page_number)
-        except EmptyPage:
-            # Если номер страницы недопустим, возвращаем последнюю страницу
-            page_objects = paginator.get_page(paginator.num_pages)
+    def get_facet_scope(self):
+        """Часть ключа кеша фасетов, которая отличает базовый queryset списка."""
+        return 'all'
 
-        # Добавление объектов в контекст шаблона
-        context['products'] = page_objects
+    def get_queryset(self):
+        # фасеты считаются один раз: сначала для валидаторов условного GET, затем для страницы
+        if not hasattr(self, 'facets'):
+            self.product_filter = ProductFilter(self.request.GET)
+            self.base_queryset = self.get_base_queryset()
+            self.facets = product_facet_cache.get(
+                self.get_facet_scope(), self.product_filter.values,
+                lambda: self.product_filter.facet_counts(self.base_queryset))
+        return self.product_filter.apply(self.base_queryset)
+
+    def get_validators(self):
+        # на странице видны только счетчики фасетов и товары из них, их и сравниваем
+        self.get_queryset()
+        return self.facets['last_change_date'], self.facets
+
+    def get_keyset_ordering(self):
+        return self.product_filter.ordering
+
+    def get_paginator_count(self):
+        # фасетный запрос уже посчитал товары с теми же фильтрами
+        return self.facets['total']
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        context['filter_form'] = self.product_filter.form
+        context['facets'] = self.facets
+        context['pagination_query'] = params.urlencode() + '&' if params else ''
         return context
 
 
-class CategoryProductsView(ListView):
+class ProductsView(ProductFilterMixin, ListView):
+    model = Product
+    template_name = 'catalog/products.html'
+    context_object_name = 'products'
+
+
+class CategoryProductsView(ProductFilterMixin, ListView):
     model = Product
     template_name = 'catalog/category_products.html'
     context_object_name = 'category_products_list'
 
+    def get_base_queryset(self):
+        self.category = get_object_or_404(Category, id=self.kwargs['category_id'])
+        return Product.objects.for_listing().filter(category=self.category)
+
+    def get_facet_scope(self):
+        return f'category:{self.kwargs["category_id"]}'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        return context
+
+
+class ProductSearchView(ListView):
+    model = Product
+    template_name = 'catalog/search.html'
+    context_object_name = 'products'
+    paginate_by = 10
+
     def get_queryset(self):
-        category_id = self.kwargs['category_id']
-        category = get_object_or_404(Category, id=category_id)
-        queryset = Product.objects.filter(category=category)
-        return queryset
+        self.query = self.request.GET.get('q', '').strip()
+        return search_products(self.query, Product.objects.for_listing())
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category_id = self.kwargs['category_id']
-        category = get_object_or_404(Category, id=category_id)
-        context['category'] = category
+        context['query'] = self.query
+        # чтобы ссылки пагинации не теряли поисковую строку
+        context['pagination_query'] = urlencode({'q': self.query}) + '&'
         return context
 
 
@@ -161,7 +328,7 @@ class UpdateProductView(LoginRequiredMixin, UpdateView):
         return reverse('catalog:product_details', args=[self.kwargs.get('pk')])
 
 
-class BlogPostListView(ListView):
+class BlogPostListView(ConditionalGetMixin, ListView):
     model = BlogPost
     template_name = 'catalog/blogpost_list.html'
     context_object_name = 'blogposts'
@@ -171,6 +338,10 @@ class BlogPostListView(ListView):
         queryset = queryset.filter(is_published=True)
         return queryset
 
+    def get_validators(self):
+        state = self.get_queryset().aggregate(last_change=Max('updated_date'), count=Count('pk'))
+        return state['last_change'], state
+
 
 class BlogPostCreateView(CreateView):
     model = BlogPost
@@ -197,8 +368,8 @@ class BlogPostDetailView(DetailView):
 
     def get_object(self, queryset=None):
         self.object = super().get_object(queryset)
-        self.object.views_count += 1
-        self.object.save()
+        # Просмотр копится в счетчике и попадает в базу пачкой, показываем с учетом еще не сохраненных
+        self.object.views_count += view_counter.increment(self.object.pk)
         return self.object
 
 
@@ -230,10 +401,16 @@ class MailingSettingsListView(ListView):
     model = MailingSettings
     template_name = 'catalog/mailing_list.html'
     context_object_name = 'mailing_clients'
-    mailing_settings = MailingSettings.objects.all()
-    context = {
-        'mailing_settings': mailing_settings,
-    }
+    paginate_by = 10
+    client_preview_size = 5
+
+    def get_queryset(self):
+        # Сообщение JOIN-ом, число клиентов агрегатом и первые несколько клиентов одним запросом на всю страницу
+        clients = Client.objects.only('id', 'full_name', 'email').order_by('pk')[:self.client_preview_size]
+        return (MailingSettings.objects.select_related('message')
+                .annotate(client_count=Count('client'))
+                .prefetch_related(Prefetch('client', queryset=clients, to_attr='client_preview'))
+                .order_by('-pk'))
 
 
 class MailingSettingsCreateView(CreateView):
@@ -256,10 +433,19 @@ class MailingSettingsDetailView(DetailView):
     template_name = 'catalog/mailing_details.html'
     model = MailingSettings
     context_object_name = 'mailing'
+    clients_paginate_by = 50
+
+    def get_queryset(self):
+        return MailingSettings.objects.select_related('message').annotate(client_count=Count('client'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Дополнительный код для получения дополнительных данных, если требуется
+        paginator = Paginator(self.object.client.order_by('pk'), self.clients_paginate_by)
+        # количество клиентов уже посчитано в get_queryset
+        paginator.count = self.object.client_count
+        page = paginator.get_page(self.request.GET.get('page'))
+        context.update({'paginator': paginator, 'page_obj': page, 'is_paginated': page.has_other_pages(),
+                        'clients': page.object_list})
         return context
 
 
@@ -297,19 +483,10 @@ class VersionCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         # if form.instance.author != self.request.user:
         #     redirect('users/error_create')
-        product_id = self.kwargs['product_id']
-        product = get_object_or_404(Product, id=product_id)
-
         version = form.save(commit=False)
-        version.product = product
-
-        if version.is_current:
-            active_version = Version.objects.filter(product=product, is_current=True).first()
-            if active_version:
-                active_version.is_current = False
-                active_version.save()
-
-            product.active_version = version
-            product.save()
-
-        return super().form_valid(form)
+        version.product_id = self.kwargs['product_id']
+        try:
+            self.object = save_version(version)
+        except Product.DoesNotExist:
+            raise Http404('Товар не найден')
+        return redirect(self.get_success_url())
@@ -0,0 +1,106 @@
+import os
+import threading
+
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+import psycopg2 as Database
+from psycopg2 import extras, pool
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool, который при исчерпании ждет освободившееся соединение, а не сразу бросает PoolError."""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+
+    def getconn(self, key=None, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise pool.PoolError(f'за {timeout} с не освободилось ни одно из {self.maxconn} соединений пула')
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        super().putconn(conn, key, close)
+        self._slots.release()
+
+
+def get_pool(alias, conn_params, min_size, max_size):
+    """Пул соединений процесса. После fork дочерний процесс создает свой пул, а не делит сокеты с родителем."""
+    key = (alias, os.getpid())
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = BlockingConnectionPool(min_size, max_size, **conn_params)
+        return _pools[key]
+
+
+class DatabaseWrapper(PostgresDatabaseWrapper):
+    """
+    PostgreSQL с пулом соединений внутри процесса (psycopg2 ThreadedConnectionPool).
+
+    Подключается через ENGINE = 'config.db', размер пула задается в OPTIONS:
+    'pool': {'min_size': 2, 'max_size': 10, 'timeout': 30}. min_size - сколько соединений пул держит открытыми,
+    max_size - сколько можно выдать одновременно (не меньше числа потоков процесса), timeout - сколько секунд
+    ждать свободного соединения, если все заняты.
+    Закрытие соединения Django (в конце запроса при CONN_MAX_AGE = 0) возвращает его в пул,
+    незавершенная транзакция при этом откатывается.
+    Соединение из пула перед выдачей проверяется (при CONN_HEALTH_CHECKS - запросом SELECT 1),
+    оборванные после перезапуска базы соединения закрываются и заменяются новыми.
+    """
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS'].get('pool') or {}
+        self._pool = get_pool(self.alias, conn_params, options.get('min_size', 2), options.get('max_size', 10))
+        connection = self.get_pooled_connection(options.get('timeout', 30))
+
+        isolation_level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel.READ_COMMITTED if isolation_level is None else IsolationLevel(
+            isolation_level)
+        if isolation_level is not None:
+            connection.isolation_level = self.isolation_level
+        # как в базовом бэкенде: jsonb отдается строкой, JSONField сам разбирает ее
+        extras.register_default_jsonb(conn_or_curs=connection, loads=lambda x: x)
+        return connection
+
+    def get_pooled_connection(self, timeout):
+        # мертвые соединения выбрасываются, после них пул откроет новое
+        while True:
+            try:
+                connection = self._pool.getconn(timeout=timeout)
+            except pool.PoolError as error:
+                # OperationalError Django покажет как обычную ошибку подключения к базе
+                raise Database.OperationalError(f'Пул соединений {self.alias} исчерпан: {error}') from error
+            if self.is_pooled_connection_usable(connection):
+                return connection
+            self._pool.putconn(connection, close=True)
+
+    def is_pooled_connection_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.settings_dict['CONN_HEALTH_CHECKS']:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            # уровень изоляции и autocommit нельзя менять внутри транзакции
+            connection.rollback()
+        except Database.Error:
+            return False
+        return True
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # закрытое соединение пул выбросит, сверх min_size - закроет
+                self._pool.putconn(self.connection)
@@ -82,11 +82,34 @@ WSGI_APPLICATION = 'config.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'django_store',
-        'USER': 'postgres'
+        'NAME': os.getenv('DB_NAME', 'django_store'),
+        'USER': os.getenv('DB_USER', 'postgres'),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        # Постоянные соединения: одно на поток, живет DB_CONN_MAX_AGE секунд и проверяется перед повторным использованием
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        'OPTIONS': {},
     }
 }
 
+# Пул соединений внутри процесса (config.db): соединение возвращается в пул в конце каждого запроса
+if os.getenv('DB_POOL') == 'True':
+    DATABASES['default']['ENGINE'] = 'config.db'
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        # сколько секунд ждать свободного соединения, когда все max_size заняты
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+    }
+
+# За pgbouncer в режиме transaction серверные курсоры (iterator()) не переживают границу транзакции.
+# Без них iterator() читает результат целиком, поэтому выгрузка каталога будет занимать больше памяти.
+if os.getenv('DB_PGBOUNCER') == 'True':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -137,11 +160,14 @@ FIXTURES_DIR = os.path.join(BASE_DIR, 'data')
 dot_env = os.path.join(BASE_DIR, '.env')
 load_dotenv(dotenv_path=dot_env)
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.gmail.com'
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_USE_SSL = False
+# Для catalog.email_backends.AsyncSMTPEmailBackend: число одновременных SMTP-сессий и писем на сессию
+EMAIL_ASYNC_POOL_SIZE = int(os.getenv('EMAIL_ASYNC_POOL_SIZE', 10))
+EMAIL_ASYNC_MESSAGES_PER_CONNECTION = 100
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 
@@ -164,3 +190,67 @@ if CACHE_ENABLED:
             "LOCATION": "redis://127.0.0.1:6379",
         }
     }
+
+# Пагинация списков товаров: 'offset' (номера страниц) или 'keyset' (курсоры, без COUNT и OFFSET)
+PRODUCTS_PAGINATION = os.getenv('PRODUCTS_PAGINATION', 'offset')
+PRODUCTS_KEYSET_ORDERING = ('-last_change_date', 'id')
+
+CATEGORIES_CACHE_TIMEOUT = 60 * 15
+CATEGORIES_CACHE_L1_TTL = 5  # Seconds
+
+# Алиас кеша для карточек товаров из CACHES, пустое значение отключает кеширование карточек
+PRODUCT_CARD_CACHE = os.getenv('PRODUCT_CARD_CACHE', 'default')
+PRODUCT_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+PRODUCT_DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+# Счетчики фасетов сбрасываются при изменении товаров, таймаут только ограничивает размер кеша
+PRODUCT_FACETS_CACHE_TIMEOUT = 60 * 15
+
+# Просмотры записей блога копятся в кеше и сохраняются пачкой
+BLOG_VIEWS_FLUSH_THRESHOLD = 100
+BLOG_VIEWS_FLUSH_INTERVAL = 60  # Seconds
+
+# Рассылки: размер пачки на одно SMTP-соединение, число соединений и лимит писем в секунду (0 - без лимита)
+MAILING_BATCH_SIZE = int(os.getenv('MAILING_BATCH_SIZE', 100))
+MAILING_CONCURRENCY = int(os.getenv('MAILING_CONCURRENCY', 1))
+MAILING_RATE_LIMIT = float(os.getenv('MAILING_RATE_LIMIT', 0))
+MAILING_LOG_BATCH_SIZE = int(os.getenv('MAILING_LOG_BATCH_SIZE', 500))
+
+SCHEDULER_POLL_INTERVAL = 2  # Seconds
+
+# 'inline' - планировщик отправляет рассылку сам, 'queue' - ставит задачу для run_mailing_workers
+MAILING_DISPATCH = os.getenv('MAILING_DISPATCH', 'inline')
+MAILING_WORKER_POLL_INTERVAL = 2  # Seconds
+MAILING_WORKER_MAX_BACKOFF = 60  # Seconds, предельная пауза воркера после ошибок подряд
+# Задача возвращается в очередь, если воркер столько не отмечался (отметка после каждой пачки писем)
+MAILING_TASK_TIMEOUT = 10 * 60  # Seconds
+MAILING_TASK_MAX_ATTEMPTS = 3
+
+# Очередь писем пользователям (подтверждение почты, новый пароль)
+OUTGOING_EMAIL_POLL_INTERVAL = 5  # Seconds
+OUTGOING_EMAIL_BATCH_SIZE = 100
+OUTGOING_EMAIL_MAX_ATTEMPTS = 5
+OUTGOING_EMAIL_RETRY_DELAY = 30  # Seconds, удваивается с каждой попыткой
+OUTGOING_EMAIL_LEASE = 5 * 60  # Seconds, на столько отправитель забирает пачку писем
+
+EMAIL_VERIFICATION_TTL = 60 * 60 * 48  # Seconds
+EMAIL_VERIFICATION_PURGE_BATCH_SIZE = 1000
+
+# Запрещенные слова в товарах: таблица ForbiddenWord и необязательный файл (по слову в строке)
+FORBIDDEN_WORDS_FILE = os.getenv('FORBIDDEN_WORDS_FILE')
+FORBIDDEN_WORDS_CHECK_INTERVAL = 5  # Seconds
+
+# Миниатюры превью товаров и записей блога, сохраняются рядом с оригиналами
+THUMBNAIL_SIZES = os.getenv('THUMBNAIL_SIZES', '200x200').split(',')
+THUMBNAIL_FORMAT = os.getenv('THUMBNAIL_FORMAT', 'webp')  # 'webp' или 'jpeg'
+THUMBNAIL_QUALITY = 85
+THUMBNAIL_QUEUE_POLL_INTERVAL = 10  # Seconds
+THUMBNAIL_QUEUE_BATCH_SIZE = 50
+# Кеш проверки, есть ли миниатюра в хранилище: найденная кешируется надолго, отсутствующая - ненадолго
+THUMBNAIL_URL_CACHE_TIMEOUT = 60 * 60 * 24
+THUMBNAIL_MISSING_CACHE_TIMEOUT = 60
+
+# Выгрузка каталога: сколько строк за раз читать из базы
+EXPORT_CHUNK_SIZE = 2000
+
+# Списки каталога: сколько секунд общий кеш (CDN, обратный прокси) может отдавать страницу гостям без проверки
+LISTING_CACHE_S_MAXAGE = int(os.getenv('LISTING_CACHE_S_MAXAGE', 60))
@@ -1,5 +1,13 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import User, OutgoingEmail
 
 admin.site.register(User)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'subject', 'kind', 'status', 'attempts', 'next_attempt_at', 'last_error')
+    list_filter = ('status', 'kind')
+    # в тексте могут быть коды подтверждения, в админке его не показываем
+    exclude = ('message',)
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.4 on 2026-10-18 20:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import hashlib
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+def move_verification_tokens(apps, schema_editor):
+    # Неподтвержденные коды переносятся в отдельную таблицу в виде хеша
+    User = apps.get_model('users', 'User')
+    EmailVerification = apps.get_model('users', 'EmailVerification')
+    expires_at = timezone.now() + timedelta(days=2)
+    users = User.objects.filter(is_verified=False, verification_token__isnull=False).values_list(
+        'pk', 'verification_token').iterator()
+    EmailVerification.objects.bulk_create(
+        (EmailVerification(user_id=pk, token_hash=hashlib.sha256(token.encode()).hexdigest(), expires_at=expires_at)
+         for pk, token in users if token),
+        batch_size=1000, ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailVerification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token_hash', models.CharField(max_length=64, unique=True, verbose_name='Хеш кода')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='email_verifications', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Код подтверждения',
+                'verbose_name_plural': 'Коды подтверждения',
+            },
+        ),
+        migrations.RunPython(move_verification_tokens, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='user',
+            name='verification_token',
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.4 on 2026-10-18 21:17
+
+from django.db import migrations, models
+
+
+def redact_failed_emails(apps, schema_editor):
+    # Неотправленные письма больше не уходят, пароли и коды в них хранить незачем
+    OutgoingEmail = apps.get_model('users', 'OutgoingEmail')
+    OutgoingEmail.objects.filter(status='failed').update(message='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_emailverification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outgoingemail',
+            name='kind',
+            field=models.CharField(choices=[('message', 'Письмо'), ('password', 'Новый пароль')], default='message', max_length=20, verbose_name='Тип'),
+        ),
+        migrations.AlterField(
+            model_name='outgoingemail',
+            name='message',
+            field=models.TextField(blank=True, verbose_name='Текст'),
+        ),
+        migrations.RunPython(redact_failed_emails, migrations.RunPython.noop),
+    ]
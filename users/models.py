@@ -5,6 +5,7 @@ NULLABLE = {'blank': True, 'null': True}
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.db import models
+from django.utils import timezone
 
 
 class UserManager(BaseUserManager):
@@ -29,10 +30,57 @@ class User(AbstractUser):
     phone = models.CharField(max_length=35, verbose_name='Телефон', blank=True, null=True)
     avatar = models.ImageField(upload_to='users/', verbose_name='Аватар', blank=True, null=True)
     country = models.CharField(max_length=50, verbose_name='Страна')
-    verification_token = models.CharField(max_length=15, verbose_name='Код верификации', blank=True, null=True)
     is_verified = models.BooleanField(default=False, verbose_name='Статус верификации')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
 
     objects = UserManager()
+
+
+class EmailVerification(models.Model):
+    """Код подтверждения почты. Хранится только SHA-256 кода, поиск идет по уникальному индексу."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='email_verifications',
+                             verbose_name='Пользователь')
+    token_hash = models.CharField(max_length=64, unique=True, verbose_name='Хеш кода')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Действует до')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создан')
+
+    def __str__(self):
+        return f'{self.user}: до {self.expires_at}'
+
+    class Meta:
+        verbose_name = 'Код подтверждения'
+        verbose_name_plural = 'Коды подтверждения'
+
+
+class OutgoingEmail(models.Model):
+    """Письмо в очереди на отправку: создается в транзакции запроса, отправляется фоновой задачей."""
+    STATUSES = (
+        ('queued', 'В очереди'),
+        ('failed', 'Не отправлено'),
+    )
+    KINDS = (
+        ('message', 'Письмо'),
+        ('password', 'Новый пароль'),
+    )
+    recipient = models.EmailField(verbose_name='Получатель')
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    # у писем с новым паролем текст пустой: пароль создается только при отправке
+    message = models.TextField(verbose_name='Текст', blank=True)
+    kind = models.CharField(max_length=20, choices=KINDS, default='message', verbose_name='Тип')
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued', verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')
+    last_error = models.TextField(verbose_name='Последняя ошибка', blank=True, null=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Следующая попытка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+
+    def __str__(self):
+        return f'{self.recipient}: {self.subject}'
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Исходящие письма'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoingemail_due_idx'),
+        ]
@@ -1,35 +1,164 @@
+import hashlib
+import logging
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 from config import settings
+from users.models import OutgoingEmail, EmailVerification
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, message, email, kind='message'):
+    # Письмо сохраняется в той же транзакции, что и изменения пользователя, отправит его фоновая задача
+    return OutgoingEmail.objects.create(subject=subject, message=message, recipient=email, kind=kind)
 
 
 def send_verification_email(email, verification_token):
     subject = 'Подтверждение почты'
     message = f'Ваш код верификации: {verification_token}'
-    from_email = settings.EMAIL_HOST_USER
-    recipient_list = [email]
+    queue_email(subject, message, email)
 
-    send_mail(subject, message, from_email, recipient_list)
 
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
 
-def send_password(email):
-    User = get_user_model()
 
-    try:
-        user = User.objects.get(email=email)
+def create_email_verification(user):
+    """Создает код подтверждения почты и возвращает его, в базе остается только хеш."""
+    token = get_random_string(length=15)
+    EmailVerification.objects.create(
+        user=user,
+        token_hash=hash_token(token),
+        expires_at=timezone.now() + timedelta(seconds=settings.EMAIL_VERIFICATION_TTL),
+    )
+    return token
+
 
-        new_password = get_random_string(length=15)
-        user.set_password(new_password)
-        user.save()
+def confirm_email(token):
+    """Подтверждает почту по коду. Возвращает пользователя или None, если код неверный или истек."""
+    if not token:
+        return None
+    verification = EmailVerification.objects.select_related('user').filter(
+        token_hash=hash_token(token), expires_at__gt=timezone.now()).first()
+    if verification is None:
+        return None
 
-        subject = 'Ваш новый пароль для входа'
-        message = f'Ваш новый пароль: {new_password}'
-        from_email = settings.EMAIL_HOST_USER
-        recipient_list = [email]
-        send_mail(subject, message, from_email, recipient_list)
+    user = verification.user
+    with transaction.atomic():
+        if not user.is_verified:
+            user.is_verified = True
+            user.save(update_fields=['is_verified'])
+        user.email_verifications.all().delete()
+    return user
 
-        return True
-    except User.DoesNotExist:
+
+def purge_expired_verifications(batch_size=None):
+    """Удаляет истекшие коды пачками, чтобы не держать долгую блокировку. Возвращает число удаленных."""
+    batch_size = batch_size or settings.EMAIL_VERIFICATION_PURGE_BATCH_SIZE
+    deleted = 0
+    while True:
+        ids = list(EmailVerification.objects.filter(expires_at__lte=timezone.now())
+                   .values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += EmailVerification.objects.filter(pk__in=ids).delete()[0]
+
+
+def send_password(email):
+    """
+    Ставит в очередь письмо с новым паролем. В очереди хранится только получатель:
+    пароль создается и сохраняется в момент отправки, см. prepare_password.
+    """
+    if not get_user_model().objects.filter(email=email).exists():
         return False
+    queue_email('Ваш новый пароль для входа', '', email, kind='password')
+    return True
+
+
+def prepare_password(outgoing):
+    """Создает новый пароль получателю письма. Возвращает пользователя (еще не сохраненного) и текст письма."""
+    user = get_user_model().objects.filter(email=outgoing.recipient).first()
+    if user is None:
+        return None, None
+    new_password = get_random_string(length=15)
+    user.set_password(new_password)
+    return user, f'Ваш новый пароль: {new_password}'
+
+
+def claim_queued_emails(batch_size):
+    """
+    Забирает пачку писем в короткой транзакции: next_attempt_at сдвигается на время аренды,
+    и другие отправители их не видят. Если отправитель упадет, письма снова станут доступны после аренды.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # SKIP LOCKED: несколько отправителей не возьмут одно и то же письмо
+        emails = list(OutgoingEmail.objects.select_for_update(skip_locked=True)
+                      .filter(status='queued', next_attempt_at__lte=now)
+                      .order_by('next_attempt_at')[:batch_size])
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            next_attempt_at=now + timedelta(seconds=settings.OUTGOING_EMAIL_LEASE))
+    return emails
+
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = str(error)
+    email.next_attempt_at = timezone.now() + timedelta(seconds=settings.OUTGOING_EMAIL_RETRY_DELAY * 2 ** email.attempts)
+    if email.attempts >= settings.OUTGOING_EMAIL_MAX_ATTEMPTS:
+        # больше не отправляем: код подтверждения в тексте хранить незачем
+        email.status = 'failed'
+        email.message = ''
+    email.save(update_fields=['attempts', 'last_error', 'next_attempt_at', 'status', 'message'])
+
+
+def send_queued_emails(batch_size=None):
+    """
+    Отправляет пачку писем из очереди через одно SMTP-соединение.
+    Письма арендуются в короткой транзакции, отправка идет вне ее, результат каждого письма
+    сохраняется сразу: отправленные удаляются, при ошибке попытка откладывается с экспоненциальной задержкой.
+    Возвращает количество отправленных писем.
+    """
+    emails = claim_queued_emails(batch_size or settings.OUTGOING_EMAIL_BATCH_SIZE)
+    if not emails:
+        return 0
+
+    sent = failed = 0
+    connection = get_connection()
+    for email in emails:
+        user, body = None, email.message
+        if email.kind == 'password':
+            user, body = prepare_password(email)
+            if user is None:
+                # пользователя удалили, пока письмо ждало в очереди
+                email.delete()
+                continue
+        message = EmailMessage(email.subject, body, settings.EMAIL_HOST_USER, [email.recipient],
+                               connection=connection)
+        try:
+            # open() ничего не делает, если соединение уже открыто
+            connection.open()
+            connection.send_messages([message])
+        except Exception as error:
+            connection.close()
+            record_failure(email, error)
+            failed += 1
+            continue
+
+        with transaction.atomic():
+            # пароль меняется, только если письмо с ним ушло
+            if user is not None:
+                user.save(update_fields=['password'])
+            email.delete()
+        sent += 1
+    connection.close()
+
+    if failed:
+        logger.warning('Не удалось отправить писем: %s', failed)
+    return sent
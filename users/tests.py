@@ -1,3 +1,122 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core import mail
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from config import settings
+from users.models import User, OutgoingEmail, EmailVerification
+from users.services import send_password, send_queued_emails, queue_email, create_email_verification, confirm_email, \
+    purge_expired_verifications, claim_queued_emails
+
+
+class PasswordEmailTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='old-password')
+
+    def test_password_is_not_stored_in_queue(self):
+        self.assertTrue(send_password('user@example.com'))
+        self.assertFalse(send_password('unknown@example.com'))
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.kind, email.message), ('password', ''))
+        # до отправки пароль не меняется
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('old-password'))
+
+        self.assertEqual(send_queued_emails(), 1)
+        new_password = mail.outbox[0].body.rsplit(' ', 1)[-1]
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password(new_password))
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_failed_email_is_redacted(self):
+        OutgoingEmail.objects.create(subject='Код', message='Ваш код верификации: 123', recipient='user@example.com')
+        send_password('user@example.com')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            for _ in range(settings.OUTGOING_EMAIL_MAX_ATTEMPTS):
+                send_queued_emails()
+                OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(list(OutgoingEmail.objects.values_list('status', 'message')), [('failed', '')] * 2)
+        # письмо не ушло - пароль остался прежним
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('old-password'))
+
+
+class OutgoingEmailRetryTestCase(TestCase):
+
+    def test_retry_with_backoff(self):
+        queue_email('Тема', 'Текст', 'user@example.com')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('down')):
+            self.assertEqual(send_queued_emails(), 0)
+            # следующая попытка еще не наступила
+            self.assertEqual(send_queued_emails(), 0)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts, email.last_error), ('queued', 1, 'down'))
+        delay = (email.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(delay, settings.OUTGOING_EMAIL_RETRY_DELAY * 2, delta=5)
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_emails(), 1)
+        self.assertEqual(mail.outbox[0].body, 'Текст')
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+    def test_claimed_emails_are_leased(self):
+        queue_email('Тема', 'Текст', 'user@example.com')
+        claimed_during_send = []
+
+        def send_messages(messages):
+            # пока идет отправка, другой отправитель это письмо не получит
+            claimed_during_send.extend(claim_queued_emails(10))
+            return len(messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=send_messages):
+            self.assertEqual(send_queued_emails(), 1)
+        self.assertEqual(claimed_during_send, [])
+        self.assertFalse(OutgoingEmail.objects.exists())
+
+
+class EmailVerificationTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='password')
+
+    def test_confirm_email(self):
+        token = create_email_verification(self.user)
+        create_email_verification(self.user)
+        # в базе хранится только хеш кода
+        self.assertFalse(EmailVerification.objects.filter(token_hash=token).exists())
+        self.assertIsNone(confirm_email('wrong'))
+        self.assertIsNone(confirm_email(''))
+
+        self.assertEqual(confirm_email(token), self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.is_verified)
+        # остальные коды пользователя больше не нужны
+        self.assertFalse(EmailVerification.objects.exists())
+
+    def test_expired_token(self):
+        token = create_email_verification(self.user)
+        EmailVerification.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertIsNone(confirm_email(token))
+
+    def test_purge_expired(self):
+        for _ in range(4):
+            create_email_verification(self.user)
+        expired = list(EmailVerification.objects.order_by('pk').values_list('pk', flat=True)[:3])
+        EmailVerification.objects.filter(pk__in=expired).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(purge_expired_verifications(batch_size=2), 3)
+        self.assertEqual(EmailVerification.objects.count(), 1)
 
-# Create your tests here.
+    def test_tokens_bench_leaves_no_data(self):
+        User.objects.create_user(email='bench-tokens@example.com', password='password')
+        for _ in range(2):
+            call_command('bench', 'tokens', '--users', '10', '--repeat', '1', stdout=io.StringIO())
+        self.assertEqual(User.objects.filter(email__startswith='bench-tokens').count(), 1)
+        self.assertFalse(EmailVerification.objects.exists())
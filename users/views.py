@@ -1,17 +1,16 @@
 from django.contrib import messages
-from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import PasswordChangeForm, PasswordResetForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import PasswordChangeView, PasswordResetView, PasswordResetDoneView, \
     PasswordResetConfirmView, PasswordResetCompleteView
+from django.db import transaction
 from django.shortcuts import render, redirect
 from django.urls import reverse_lazy
-from django.utils.crypto import get_random_string
 from django.views import View
 from django.views.generic import CreateView, UpdateView, TemplateView
 from users.forms import UserRegisterForm, UserProfileForm
-from users.services import send_verification_email, send_password
+from users.services import send_verification_email, send_password, create_email_verification, confirm_email
 
 
 class RegisterView(CreateView):
@@ -20,10 +19,12 @@ class RegisterView(CreateView):
     template_name = 'users/register.html'
 
     def form_valid(self, form):
-        verification_token = get_random_string(length=15)
-        form.instance.verification_token = verification_token
-        send_verification_email(form.instance.email, verification_token)
-        return super().form_valid(form)
+        # Письмо только ставится в очередь вместе с пользователем, ответ не ждет SMTP
+        with transaction.atomic():
+            response = super().form_valid(form)
+            verification_token = create_email_verification(self.object)
+            send_verification_email(self.object.email, verification_token)
+        return response
 
     def get_success_url(self):
         return reverse_lazy('users:verification_email')
@@ -37,15 +38,8 @@ class VerifyEmailView(View):
 
     def post(self, request):
         verification_code = request.POST.get('verification_code')
-        User = get_user_model()
-        try:
-            user = User.objects.get(verification_token=verification_code)
-            if not user.is_verified:
-                user.is_verified = True
-                user.save()
-                return redirect('users:confirmation_success')
-        except User.DoesNotExist:
-            pass
+        if confirm_email(verification_code) is not None:
+            return redirect('users:confirmation_success')
         return redirect('users:confirmation_error')
 
 
@@ -64,17 +58,9 @@ class CreationErrorView(TemplateView):
 class ConfirmEmailView(View):
 
     def get(self, request, token):
-        User = get_user_model()
-
-        try:
-            user = User.objects.get(verification_token=token)
-            if not user.is_verified:
-                user.is_verified = True
-                user.save()
-                return render(request, 'confirmation_success.html')
-
-        except User.DoesNotExist:
-            return render(request, 'confirmation_error.html')
+        if confirm_email(token) is not None:
+            return render(request, 'users/confirmation_success.html')
+        return render(request, 'users/confirmation_error.html')
 
 
 class ProfileView(UpdateView):